@@ -1,6 +1,17 @@
+import argparse
+import os
+import sys
 from colorama import init, Fore, Style
-from utils.encryption import encrypt_directory
-from utils.decryption import decrypt_directory
+from utils.encryption import (
+    MAX_WORKERS,
+    delete_files,
+    encrypt_directory,
+    encrypt_files,
+    forget_keys,
+    list_files_to_encrypt,
+    pack_files,
+)
+from utils.decryption import decrypt_directory, decrypt_files, list_encrypted_files
 
 # Initialize colorama for cross-platform support
 init(autoreset=True)
@@ -15,7 +26,7 @@ def display_banner():
     Returns:
         None
     """
-    VERSION = "v0.1.0"
+    VERSION = "v0.2.0"
     AUTHOR = "Ralph Joseph Castro"
     GITHUB = "https://github.com/luhluh-17"
 
@@ -57,8 +68,10 @@ def main_menu():
 
         if option == "1":
             encrypt_directory()
+            forget_keys()
         elif option == "2":
             decrypt_directory()
+            forget_keys()
         elif option == "3":
             print(f"\n{Fore.GREEN}Thank you for using Kubli!")
             print(f"{Fore.GREEN}Goodbye!")
@@ -70,17 +83,179 @@ def main_menu():
             print("\n")
 
 
-def main():
+def build_parser():
+    """
+    Build the command line parser for non-interactive batch runs.
+
+    Returns:
+        argparse.ArgumentParser: The parser with encrypt and decrypt subcommands
+    """
+    parser = argparse.ArgumentParser(
+        prog="kubli",
+        description="Encrypt or decrypt every file in a directory. "
+        "Run without arguments for the interactive menu.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for command in ("encrypt", "decrypt"):
+        subparser = subparsers.add_parser(command, help=f"{command} a directory")
+        subparser.add_argument(
+            "--dir",
+            default=os.getcwd(),
+            help="directory to process (default: current directory)",
+        )
+        password_group = subparser.add_mutually_exclusive_group(required=True)
+        password_group.add_argument("--password", help="the encryption key")
+        password_group.add_argument(
+            "--password-file",
+            help="file whose first line is the encryption key, or - for stdin",
+        )
+        password_group.add_argument(
+            "--password-env",
+            metavar="VARIABLE",
+            help="environment variable holding the encryption key",
+        )
+        subparser.add_argument(
+            "--jobs",
+            type=int,
+            default=MAX_WORKERS,
+            help=f"number of files processed at the same time (default: {MAX_WORKERS})",
+        )
+        subparser.add_argument(
+            "--keep-originals",
+            action="store_true",
+            help="keep the input files instead of deleting them after success",
+        )
+        subparser.add_argument("--quiet", action="store_true", help="only print errors")
+        if command == "encrypt":
+            subparser.add_argument(
+                "--pack",
+                action="store_true",
+                help="pack all files into a single encrypted tar archive",
+            )
+            subparser.add_argument(
+                "--no-hide-names",
+                dest="hide_names",
+                action="store_false",
+                help="keep the original filenames instead of encrypting them",
+            )
+
+    return parser
+
+
+def read_password(args, parser):
+    """
+    Get the password from the parsed command line arguments.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments
+        parser (argparse.ArgumentParser): The parser, used to report errors
+
+    Returns:
+        str: The password
+    """
+    if args.password_env is not None:
+        password = os.environ.get(args.password_env)
+    elif args.password_file is None:
+        password = args.password
+    elif args.password_file == "-":
+        password = sys.stdin.readline().rstrip("\r\n")
+    else:
+        try:
+            with open(args.password_file) as password_file:
+                password = password_file.readline().rstrip("\r\n")
+        except OSError as e:
+            parser.error(f"cannot read password file: {e}")
+
+    if not password:
+        parser.error("the encryption key cannot be empty")
+    return password
+
+
+def run_cli(argv):
+    """
+    Encrypt or decrypt a directory as described by command line arguments.
+
+    Unlike the interactive menu, nothing is asked for confirmation and the
+    input files are deleted after success unless --keep-originals is given.
+
+    Args:
+        argv (list): The command line arguments, without the program name
+
+    Returns:
+        int: The exit status, 0 if every file was processed successfully
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    password = read_password(args, parser)
+
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if not os.path.isdir(args.dir):
+        parser.error(f"directory '{args.dir}' does not exist")
+
+    if args.command == "encrypt" and args.pack:
+        file_paths = list_files_to_encrypt(args.dir)
+        packed = bool(file_paths) and pack_files(
+            file_paths, args.dir, password, hide_name=args.hide_names
+        )
+        successful = file_paths if packed else []
+        if packed and not args.keep_originals:
+            delete_files(successful, quiet=args.quiet)
+    elif args.command == "encrypt":
+        file_paths = list_files_to_encrypt(args.dir)
+        successful = encrypt_files(
+            file_paths,
+            password,
+            max_workers=args.jobs,
+            quiet=args.quiet,
+            hide_names=args.hide_names,
+            delete_originals=not args.keep_originals,
+        )
+    else:
+        file_paths = list_encrypted_files(args.dir)
+        successful = decrypt_files(
+            file_paths,
+            password,
+            max_workers=args.jobs,
+            quiet=args.quiet,
+            delete_encrypted=not args.keep_originals,
+        )
+    forget_keys()
+
+    if not args.quiet:
+        print(
+            f"{Fore.GREEN}{Style.BRIGHT}{len(successful)} of {len(file_paths)} files "
+            f"{args.command}ed."
+        )
+    return 0 if len(successful) == len(file_paths) else 1
+
+
+def main(argv=None):
     """
     Main entry point for the Kubli file encryption/decryption application.
 
+    Runs the command line interface when arguments are given, and the
+    interactive menu otherwise.
+
+    Args:
+        argv (list, optional): The command line arguments, without the
+            program name. Defaults to sys.argv[1:].
+
     Returns:
-        None
+        int: The exit status
     """
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if argv:
+        return run_cli(argv)
+
     display_banner()
     main_menu()
+    return 0
 
 
 # Run the application
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,37 @@
+import pytest
+import os
+import sys
+from unittest.mock import MagicMock
+
+# Add the parent directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils import encryption
+
+
+@pytest.fixture(scope="session", autouse=True)
+def fast_key_derivation():
+    """Use a low scrypt cost for the test session.
+
+    The tests check that keys are derived and used correctly, not how hard
+    they are to brute force, so the production work factor only slows them
+    down.
+    """
+    encryption.generate_key_from_password.cache_clear()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(encryption, "KDF_N", 2**4)
+        yield
+    encryption.generate_key_from_password.cache_clear()
+
+
+@pytest.fixture
+def make_dir_entry():
+    """Return a factory that builds mock os.DirEntry objects for regular files."""
+    def make(path):
+        entry = MagicMock(path=path)
+        entry.name = path.rsplit('/', 1)[-1]
+        entry.is_file.return_value = True
+        entry.stat.return_value.st_size = 0
+        return entry
+
+    return make
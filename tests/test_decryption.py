@@ -2,7 +2,6 @@ import pytest
 import os
 import tempfile
 from unittest.mock import patch, MagicMock
-from cryptography.fernet import Fernet
 import sys
 
 # Add the parent directory to the path so we can import our modules
@@ -11,9 +10,21 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from utils.decryption import (
     decrypt_filename,
     decrypt_file,
-    decrypt_directory
+    decrypt_directory,
+    list_encrypted_files,
+    read_original_filename
+)
+from utils.encryption import (
+    generate_key_from_password,
+    create_ciphers,
+    SALT_SIZE,
+    encrypt_filename,
+    encrypt_file,
+    encrypt_files,
+    FILE_HEADER,
+    FILE_MAGIC,
+    FORMAT_VERSION
 )
-from utils.encryption import generate_key_from_password, encrypt_filename, encrypt_file
 
 
 class TestDecryption:
@@ -22,49 +33,64 @@ class TestDecryption:
     def setup_method(self):
         """Set up test fixtures before each test method."""
         self.test_password = "test_password_123"
-        self.test_key = generate_key_from_password(self.test_password)
+        self.test_salt = os.urandom(SALT_SIZE)
+        self.test_key = generate_key_from_password(self.test_password, self.test_salt)
+        self.test_aessiv, self.test_aesgcm = create_ciphers(self.test_key)
         self.test_filename = "test_file.txt"
         self.test_content = b"This is test content for decryption."
 
     def test_decrypt_filename(self):
         """Test filename decryption."""
         # First encrypt a filename
-        encrypted_filename = encrypt_filename(self.test_filename, self.test_key)
+        encrypted_filename = encrypt_filename(self.test_filename, self.test_aessiv)
         assert encrypted_filename is not None
         
         # Then decrypt it
-        decrypted_filename = decrypt_filename(encrypted_filename, self.test_key)
+        decrypted_filename = decrypt_filename(encrypted_filename, self.test_aessiv)
         
         # Should return the original filename
         assert decrypted_filename == self.test_filename
 
+    def test_decrypt_filename_roundtrip_many_names(self):
+        """Test filename roundtrip for tokens containing '_' and '-' characters."""
+        filenames = [f"report_{i}-final.txt" * (i % 4 + 1) for i in range(50)]
+        for filename in filenames:
+            encrypted_filename = encrypt_filename(filename, self.test_aessiv)
+            assert decrypt_filename(encrypted_filename, self.test_aessiv) == filename
+
     def test_decrypt_filename_with_invalid_key(self):
         """Test filename decryption with invalid key."""
         # First encrypt a filename with correct key
-        encrypted_filename = encrypt_filename(self.test_filename, self.test_key)
+        encrypted_filename = encrypt_filename(self.test_filename, self.test_aessiv)
         assert encrypted_filename is not None
         
         # Try to decrypt with wrong key
-        wrong_key = generate_key_from_password("wrong_password")
-        result = decrypt_filename(encrypted_filename, wrong_key)
+        wrong_aessiv, _ = create_ciphers(generate_key_from_password("wrong_password", self.test_salt))
+        result = decrypt_filename(encrypted_filename, wrong_aessiv)
         assert result is None
 
     def test_decrypt_filename_with_invalid_data(self):
         """Test filename decryption with invalid encrypted data."""
         invalid_encrypted_filename = "invalid_encrypted_data"
-        result = decrypt_filename(invalid_encrypted_filename, self.test_key)
+        result = decrypt_filename(invalid_encrypted_filename, self.test_aessiv)
         assert result is None
 
-    def test_decrypt_file(self):
+    @pytest.mark.parametrize("filename,content", [
+        ("test_file.txt", b"This is test content for decryption."),
+        ("data.csv", b"name,age\nJohn,30\nJane,25"),
+        ("empty.txt", b""),
+        ("special file & !@#.txt", b"Content with special filename"),
+    ])
+    def test_decrypt_file(self, filename, content):
         """Test file decryption."""
         with tempfile.TemporaryDirectory() as temp_dir:
             # Create and encrypt a test file
-            test_file_path = os.path.join(temp_dir, self.test_filename)
+            test_file_path = os.path.join(temp_dir, filename)
             with open(test_file_path, 'wb') as f:
-                f.write(self.test_content)
+                f.write(content)
             
             # Encrypt the file
-            encrypt_result = encrypt_file(test_file_path, self.test_key)
+            encrypt_result = encrypt_file(test_file_path, self.test_password, self.test_salt)
             assert encrypt_result is True
             
             # Find the encrypted file
@@ -76,14 +102,14 @@ class TestDecryption:
             os.remove(test_file_path)
             
             # Decrypt the file
-            decrypt_result = decrypt_file(encrypted_file_path, self.test_key)
+            decrypt_result = decrypt_file(encrypted_file_path, self.test_password)
             assert decrypt_result is True
             
             # Verify the decrypted file exists and has correct content
             assert os.path.exists(test_file_path)
             with open(test_file_path, 'rb') as f:
                 decrypted_content = f.read()
-            assert decrypted_content == self.test_content
+            assert decrypted_content == content
 
     def test_decrypt_file_with_wrong_key(self):
         """Test file decryption with wrong key."""
@@ -93,7 +119,7 @@ class TestDecryption:
             with open(test_file_path, 'wb') as f:
                 f.write(self.test_content)
             
-            encrypt_result = encrypt_file(test_file_path, self.test_key)
+            encrypt_result = encrypt_file(test_file_path, self.test_password, self.test_salt)
             assert encrypt_result is True
             
             # Find the encrypted file
@@ -101,20 +127,219 @@ class TestDecryption:
             encrypted_file_path = os.path.join(temp_dir, encrypted_files[0])
             
             # Try to decrypt with wrong key
-            wrong_key = generate_key_from_password("wrong_password")
-            decrypt_result = decrypt_file(encrypted_file_path, wrong_key)
+            decrypt_result = decrypt_file(encrypted_file_path, "wrong_password")
             assert decrypt_result is False
 
+    def test_decrypt_file_with_plain_name(self):
+        """Test decrypting a file whose name was kept instead of encrypted."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_file_path = os.path.join(temp_dir, self.test_filename)
+            with open(test_file_path, 'wb') as f:
+                f.write(self.test_content)
+
+            assert encrypt_file(test_file_path, self.test_password, self.test_salt, hide_name=False) is True
+            encrypted_file_path = test_file_path + '.kubli'
+            assert sorted(os.listdir(temp_dir)) == [self.test_filename, self.test_filename + '.kubli']
+            os.remove(test_file_path)
+
+            assert read_original_filename(encrypted_file_path, self.test_password) == self.test_filename
+            assert decrypt_file(encrypted_file_path, self.test_password) is True
+            with open(test_file_path, 'rb') as f:
+                assert f.read() == self.test_content
+
+    def test_decrypt_file_with_tampered_flags(self):
+        """Test that changing the header flags makes decryption fail."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_file_path = os.path.join(temp_dir, self.test_filename)
+            with open(test_file_path, 'wb') as f:
+                f.write(self.test_content)
+
+            assert encrypt_file(test_file_path, self.test_password, self.test_salt, hide_name=False) is True
+            os.remove(test_file_path)
+
+            # Clear the plain name flag so the name would be treated as encrypted
+            encrypted_file_path = test_file_path + '.kubli'
+            with open(encrypted_file_path, 'r+b') as f:
+                f.seek(len(FILE_HEADER))
+                f.write(b"\x00")
+
+            assert decrypt_file(
+                encrypted_file_path, self.test_password, self.test_filename
+            ) is False
+            assert not os.path.exists(test_file_path)
+
+    def test_decrypt_file_unsupported_format(self):
+        """Test decrypting a file without the kubli format header."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            encrypted_filename = encrypt_filename(self.test_filename, self.test_aessiv)
+            encrypted_file_path = os.path.join(temp_dir, encrypted_filename + '.kubli')
+            with open(encrypted_file_path, 'wb') as f:
+                f.write(b"not a kubli file")
+
+            result = decrypt_file(encrypted_file_path, self.test_password)
+            assert result is False
+            assert not os.path.exists(os.path.join(temp_dir, self.test_filename))
+
+    def test_decrypt_file_older_format_version(self):
+        """Test that a file from an older format version is reported as unsupported."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_file_path = os.path.join(temp_dir, self.test_filename)
+            with open(test_file_path, 'wb') as f:
+                f.write(self.test_content)
+
+            assert encrypt_file(test_file_path, self.test_password, self.test_salt) is True
+            os.remove(test_file_path)
+
+            # Rewrite the version byte as if the file came from version 1
+            encrypted_file_path = os.path.join(temp_dir, os.listdir(temp_dir)[0])
+            with open(encrypted_file_path, 'r+b') as f:
+                f.seek(len(FILE_MAGIC))
+                f.write(bytes([FORMAT_VERSION - 1]))
+
+            with patch('builtins.print') as mock_print:
+                result = decrypt_file(encrypted_file_path, self.test_password)
+            assert result is False
+            assert 'unsupported file format' in str(mock_print.call_args)
+            assert not os.path.exists(test_file_path)
+
+    @pytest.mark.parametrize("filename", ["test_file.txt", ".kubli"])
+    def test_decrypt_file_rejects_non_kubli_name(self, filename):
+        """Test that files without a .kubli name are rejected before being opened."""
+        with patch('builtins.open') as mock_open, patch('builtins.print'):
+            result = decrypt_file(
+                os.path.join("/test/directory", filename), self.test_password
+            )
+        assert result is False
+        mock_open.assert_not_called()
+
+    @patch('utils.decryption.CHUNK_SIZE', 16)
+    @patch('utils.encryption.CHUNK_SIZE', 16)
+    def test_decrypt_file_truncated(self):
+        """Test that a file truncated at a chunk boundary fails to decrypt."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_file_path = os.path.join(temp_dir, self.test_filename)
+            with open(test_file_path, 'wb') as f:
+                f.write(self.test_content)
+
+            encrypt_result = encrypt_file(test_file_path, self.test_password, self.test_salt)
+            assert encrypt_result is True
+            os.remove(test_file_path)
+
+            # Drop the final chunk (the leftover content plus its 16-byte tag)
+            encrypted_files = [f for f in os.listdir(temp_dir) if f.endswith('.kubli')]
+            encrypted_file_path = os.path.join(temp_dir, encrypted_files[0])
+            last_chunk_size = len(self.test_content) % 16 + 16
+            with open(encrypted_file_path, 'rb+') as f:
+                f.truncate(os.path.getsize(encrypted_file_path) - last_chunk_size)
+
+            decrypt_result = decrypt_file(encrypted_file_path, self.test_password)
+            assert decrypt_result is False
+            assert not os.path.exists(test_file_path)
+
+            # No temporary output should be left behind
+            assert os.listdir(temp_dir) == [encrypted_files[0]]
+
+    @patch('utils.decryption.CHUNK_SIZE', 16)
+    @patch('utils.encryption.CHUNK_SIZE', 16)
+    def test_decrypt_file_failure_keeps_existing_file(self):
+        """Test that a failed decryption does not clobber an existing file."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_file_path = os.path.join(temp_dir, self.test_filename)
+            with open(test_file_path, 'wb') as f:
+                f.write(self.test_content)
+
+            encrypt_result = encrypt_file(test_file_path, self.test_password, self.test_salt)
+            assert encrypt_result is True
+
+            # Corrupt the last byte of the encrypted file
+            encrypted_files = [f for f in os.listdir(temp_dir) if f.endswith('.kubli')]
+            encrypted_file_path = os.path.join(temp_dir, encrypted_files[0])
+            with open(encrypted_file_path, 'rb+') as f:
+                f.seek(-1, os.SEEK_END)
+                last_byte = f.read(1)
+                f.seek(-1, os.SEEK_END)
+                f.write(bytes([last_byte[0] ^ 0xFF]))
+
+            decrypt_result = decrypt_file(encrypted_file_path, self.test_password)
+            assert decrypt_result is False
+
+            # The existing file keeps its content and no temporary file remains
+            with open(test_file_path, 'rb') as f:
+                assert f.read() == self.test_content
+            assert sorted(os.listdir(temp_dir)) == sorted([self.test_filename, encrypted_files[0]])
+
+    def test_decrypt_file_does_not_replace_existing_file(self):
+        """Test that decryption never replaces a file with the original name."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_file_path = os.path.join(temp_dir, self.test_filename)
+            with open(test_file_path, 'wb') as f:
+                f.write(self.test_content)
+
+            assert encrypt_file(test_file_path, self.test_password, self.test_salt) is True
+            with open(test_file_path, 'wb') as f:
+                f.write(b"newer content")
+
+            encrypted_files = [f for f in os.listdir(temp_dir) if f.endswith('.kubli')]
+            encrypted_file_path = os.path.join(temp_dir, encrypted_files[0])
+            with patch('builtins.print'):
+                decrypt_result = decrypt_file(
+                    encrypted_file_path, self.test_password, delete_encrypted=True
+                )
+            assert decrypt_result is False
+
+            # Both files are kept and no temporary file remains
+            with open(test_file_path, 'rb') as f:
+                assert f.read() == b"newer content"
+            assert sorted(os.listdir(temp_dir)) == sorted([self.test_filename, encrypted_files[0]])
+
+    @pytest.mark.skipif(not hasattr(os, 'fchmod'), reason="fchmod not available")
+    @patch('utils.encryption._UMASK', 0o022)
+    def test_decrypt_file_mode_follows_umask(self):
+        """Test that the decrypted file gets the mode the umask allows."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_file_path = os.path.join(temp_dir, self.test_filename)
+            with open(test_file_path, 'wb') as f:
+                f.write(self.test_content)
+
+            assert encrypt_file(test_file_path, self.test_password, self.test_salt) is True
+            os.remove(test_file_path)
+
+            encrypted_files = [f for f in os.listdir(temp_dir) if f.endswith('.kubli')]
+            encrypted_file_path = os.path.join(temp_dir, encrypted_files[0])
+            assert os.stat(encrypted_file_path).st_mode & 0o777 == 0o644
+
+            assert decrypt_file(encrypted_file_path, self.test_password) is True
+            assert os.stat(test_file_path).st_mode & 0o777 == 0o644
+
     def test_decrypt_file_nonexistent(self):
         """Test decrypting a non-existent file."""
-        result = decrypt_file("/nonexistent/file.kubli", self.test_key)
+        result = decrypt_file("/nonexistent/file.kubli", self.test_password)
         assert result is False
 
+    def test_list_encrypted_files_skips_vanished_files(self, make_dir_entry):
+        """Test that an encrypted file removed during the listing is skipped."""
+        vanished = make_dir_entry("/test/directory/vanished.kubli")
+        vanished.stat.side_effect = FileNotFoundError("No such file")
+        kept = make_dir_entry("/test/directory/kept.kubli")
+
+        with patch('os.scandir') as mock_scandir:
+            mock_scandir.return_value.__enter__.return_value = [vanished, kept]
+            assert list_encrypted_files("/test/directory") == ["/test/directory/kept.kubli"]
+
+    def test_list_encrypted_files_unreadable_directory(self):
+        """Test that a directory that cannot be listed gives no files."""
+        with patch('os.scandir', side_effect=PermissionError("Permission denied")):
+            with patch('builtins.print') as mock_print:
+                assert list_encrypted_files("/test/directory") == []
+                mock_print.assert_any_call(
+                    '\x1b[31mError reading directory /test/directory: Permission denied'
+                )
+
     @patch('builtins.input')
-    @patch('glob.glob')
+    @patch('os.scandir')
     @patch('os.getcwd')
-    @patch('os.path.exists')
-    def test_decrypt_directory_empty_password(self, mock_exists, mock_getcwd, mock_glob, mock_input):
+    @patch('os.path.isdir')
+    def test_decrypt_directory_empty_password(self, mock_isdir, mock_getcwd, mock_scandir, mock_input):
         """Test decrypt_directory with empty password."""
         mock_input.return_value = ""  # Empty password
         
@@ -124,11 +349,11 @@ class TestDecryption:
             mock_print.assert_any_call('\x1b[31mError: Decryption key cannot be empty!')
 
     @patch('builtins.input')
-    @patch('os.path.exists')
-    def test_decrypt_directory_nonexistent_directory(self, mock_exists, mock_input):
+    @patch('os.path.isdir')
+    def test_decrypt_directory_nonexistent_directory(self, mock_isdir, mock_input):
         """Test decrypt_directory with non-existent directory."""
         mock_input.side_effect = ["test_password", "/nonexistent/directory"]
-        mock_exists.return_value = False
+        mock_isdir.return_value = False
         
         with patch('builtins.print') as mock_print:
             decrypt_directory()
@@ -136,15 +361,15 @@ class TestDecryption:
             mock_print.assert_any_call('\x1b[31mError: Directory \'/nonexistent/directory\' does not exist!')
 
     @patch('builtins.input')
-    @patch('glob.glob')
+    @patch('os.scandir')
     @patch('os.getcwd')
-    @patch('os.path.exists')
-    def test_decrypt_directory_no_files(self, mock_exists, mock_getcwd, mock_glob, mock_input):
+    @patch('os.path.isdir')
+    def test_decrypt_directory_no_files(self, mock_isdir, mock_getcwd, mock_scandir, mock_input):
         """Test decrypt_directory with no encrypted files."""
         mock_input.side_effect = ["test_password", ""]  # Use current directory
-        mock_exists.return_value = True
+        mock_isdir.return_value = True
         mock_getcwd.return_value = "/test/directory"
-        mock_glob.return_value = []  # No .kubli files found
+        mock_scandir.return_value.__enter__.return_value = []  # No .kubli files found
         
         with patch('builtins.print') as mock_print:
             decrypt_directory()
@@ -152,53 +377,73 @@ class TestDecryption:
             mock_print.assert_any_call('\x1b[33mNo encrypted files found!')
 
     @patch('builtins.input')
-    @patch('glob.glob')
+    @patch('os.scandir')
     @patch('os.getcwd')
-    @patch('os.path.exists')
+    @patch('os.path.isdir')
     @patch('os.path.basename')
-    def test_decrypt_directory_user_cancels(self, mock_basename, mock_exists, mock_getcwd, mock_glob, mock_input):
+    def test_decrypt_directory_user_cancels(self, mock_basename, mock_isdir, mock_getcwd, mock_scandir, mock_input, make_dir_entry):
         """Test decrypt_directory when user cancels operation."""
         mock_input.side_effect = ["test_password", "", "n"]  # Cancel operation
-        mock_exists.return_value = True
+        mock_isdir.return_value = True
         mock_getcwd.return_value = "/test/directory"
-        mock_glob.return_value = ["/test/directory/file1.kubli"]
+        mock_scandir.return_value.__enter__.return_value = [make_dir_entry("/test/directory/file1.kubli")]
         mock_basename.return_value = "file1.kubli"
         
-        # Mock decrypt_filename to return a valid filename for display
-        with patch('utils.decryption.decrypt_filename', return_value="file1.txt"):
+        # Mock read_original_filename to return a valid filename for display
+        with patch('utils.decryption.read_original_filename', return_value="file1.txt") as mock_read:
             with patch('builtins.print') as mock_print:
                 decrypt_directory()
-                # Should print cancellation message
+                mock_read.assert_called_once_with("/test/directory/file1.kubli", "test_password")
+                # Should preview the original filename, then print cancellation message
+                mock_print.assert_any_call('  - \x1b[35mfile1.kubli \x1b[36m→ \x1b[32mfile1.txt')
                 mock_print.assert_any_call('\x1b[33mDecryption cancelled.')
 
-    def test_encrypt_decrypt_roundtrip(self):
-        """Integration test for encrypt-decrypt roundtrip."""
+    @patch('builtins.input')
+    def test_decrypt_directory_decrypts_all_files(self, mock_input):
+        """Test decrypt_directory restores every encrypted file in the directory."""
         with tempfile.TemporaryDirectory() as temp_dir:
-            # Create a test file
-            test_file_path = os.path.join(temp_dir, self.test_filename)
-            with open(test_file_path, 'wb') as f:
-                f.write(self.test_content)
-            
-            # Encrypt the file
-            encrypt_result = encrypt_file(test_file_path, self.test_key)
-            assert encrypt_result is True
-            
-            # Remove original file
-            os.remove(test_file_path)
-            
-            # Find and decrypt the encrypted file
-            encrypted_files = [f for f in os.listdir(temp_dir) if f.endswith('.kubli')]
-            assert len(encrypted_files) == 1
-            encrypted_file_path = os.path.join(temp_dir, encrypted_files[0])
-            
-            decrypt_result = decrypt_file(encrypted_file_path, self.test_key)
-            assert decrypt_result is True
-            
-            # Verify the roundtrip worked
-            assert os.path.exists(test_file_path)
-            with open(test_file_path, 'rb') as f:
-                final_content = f.read()
-            assert final_content == self.test_content
+            file_contents = {f"file{i}.txt": f"Content {i}".encode() for i in range(8)}
+            for filename, content in file_contents.items():
+                file_path = os.path.join(temp_dir, filename)
+                with open(file_path, 'wb') as f:
+                    f.write(content)
+                assert encrypt_file(file_path, self.test_password, self.test_salt) is True
+                os.remove(file_path)
+
+            # Password, directory, confirm, delete encrypted files
+            mock_input.side_effect = [self.test_password, temp_dir, "y", "y"]
+
+            with patch('builtins.print') as mock_print:
+                decrypt_directory()
+                mock_print.assert_any_call(
+                    f'\n\x1b[32m\x1b[1mDecryption complete! {len(file_contents)} files decrypted.'
+                )
+
+            assert not [f for f in os.listdir(temp_dir) if f.endswith('.kubli')]
+            for filename, expected_content in file_contents.items():
+                with open(os.path.join(temp_dir, filename), 'rb') as f:
+                    assert f.read() == expected_content
+
+    @patch('builtins.input')
+    def test_decrypt_directory_decrypts_each_filename_once(self, mock_input):
+        """Test decrypt_directory reuses the preview filenames when decrypting."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for i in range(4):
+                file_path = os.path.join(temp_dir, f"file{i}.txt")
+                with open(file_path, 'wb') as f:
+                    f.write(self.test_content)
+                assert encrypt_file(file_path, self.test_password, self.test_salt) is True
+                os.remove(file_path)
+
+            mock_input.side_effect = [self.test_password, temp_dir, "y", "n"]
+
+            with patch('utils.decryption.decrypt_filename', wraps=decrypt_filename) as mock_decrypt_filename:
+                with patch('builtins.print'):
+                    decrypt_directory()
+                assert mock_decrypt_filename.call_count == 4
+
+            for i in range(4):
+                assert os.path.exists(os.path.join(temp_dir, f"file{i}.txt"))
 
     def test_multiple_files_decrypt(self):
         """Test decrypting multiple files."""
@@ -206,21 +451,22 @@ class TestDecryption:
             # Create and encrypt multiple test files
             test_files = ["file1.txt", "file2.doc", "file3.pdf"]
             file_contents = {}
+            file_paths = []
             
             for filename in test_files:
                 content = f"Content of {filename}".encode()
                 file_contents[filename] = content
                 file_path = os.path.join(temp_dir, filename)
+                file_paths.append(file_path)
                 
                 with open(file_path, 'wb') as f:
                     f.write(content)
-                
-                # Encrypt the file
-                encrypt_result = encrypt_file(file_path, self.test_key)
-                assert encrypt_result is True
-                
-                # Remove original
-                os.remove(file_path)
+            
+            # Encrypt the files in one batch and remove the originals
+            encrypted = encrypt_files(
+                file_paths, self.test_password, quiet=True, delete_originals=True
+            )
+            assert encrypted == file_paths
             
             # Decrypt all files
             encrypted_files = [f for f in os.listdir(temp_dir) if f.endswith('.kubli')]
@@ -228,7 +474,7 @@ class TestDecryption:
             
             for encrypted_file in encrypted_files:
                 encrypted_file_path = os.path.join(temp_dir, encrypted_file)
-                decrypt_result = decrypt_file(encrypted_file_path, self.test_key)
+                decrypt_result = decrypt_file(encrypted_file_path, self.test_password)
                 assert decrypt_result is True
             
             # Verify all files were decrypted correctly
@@ -2,8 +2,8 @@ import pytest
 import os
 import tempfile
 import shutil
+import string
 from unittest.mock import patch, mock_open
-from cryptography.fernet import Fernet
 import sys
 
 # Add the parent directory to the path so we can import our modules
@@ -11,41 +11,132 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from utils.encryption import (
     generate_key_from_password,
+    create_ciphers,
+    SALT_SIZE,
     encrypt_filename,
     encrypt_file,
-    encrypt_directory
+    encrypt_files,
+    encrypt_directory,
+    forget_keys,
+    list_files_to_encrypt,
+    load_ciphers,
+    read_chunks,
+    thread_buffers,
+    FILE_HEADER
 )
 
 
+# Characters of unpadded URL-safe base64
+_VALID_FILENAME_CHARS = frozenset(string.ascii_letters + string.digits + '_-')
+
 class TestEncryption:
     """Test cases for encryption module."""
 
     def setup_method(self):
         """Set up test fixtures before each test method."""
         self.test_password = "test_password_123"
-        self.test_key = generate_key_from_password(self.test_password)
+        self.test_salt = os.urandom(SALT_SIZE)
+        self.test_key = generate_key_from_password(self.test_password, self.test_salt)
+        self.test_aessiv, self.test_aesgcm = create_ciphers(self.test_key)
         self.test_filename = "test_file.txt"
         self.test_content = b"This is test content for encryption."
 
     def test_generate_key_from_password(self):
         """Test key generation from password."""
-        key1 = generate_key_from_password(self.test_password)
-        key2 = generate_key_from_password(self.test_password)
+        key1 = generate_key_from_password(self.test_password, self.test_salt)
+        key2 = generate_key_from_password(self.test_password, self.test_salt)
         
-        # Same password should generate same key
+        # Same password and salt should generate same key
         assert key1 == key2
         
-        # Key should be valid for Fernet
-        fernet = Fernet(key1)
-        assert fernet is not None
+        # Key should be a 256-bit key
+        assert isinstance(key1, bytes)
+        assert len(key1) == 32
         
         # Different passwords should generate different keys
-        different_key = generate_key_from_password("different_password")
+        different_key = generate_key_from_password("different_password", self.test_salt)
         assert key1 != different_key
 
+        # Different salts should generate different keys
+        other_salt_key = generate_key_from_password(self.test_password, os.urandom(SALT_SIZE))
+        assert key1 != other_salt_key
+
+    def test_key_derivation_is_cached(self):
+        """Test that keys and ciphers are derived once per password and salt."""
+        key1 = generate_key_from_password(self.test_password, self.test_salt)
+        key2 = generate_key_from_password(self.test_password, self.test_salt)
+        assert key1 is key2
+
+        assert create_ciphers(key1) is create_ciphers(key2)
+        assert load_ciphers(self.test_password, self.test_salt) is create_ciphers(key1)
+
+    def test_forget_keys_drops_cached_passwords(self):
+        """Test that forget_keys empties the key and cipher caches."""
+        load_ciphers(self.test_password, self.test_salt)
+        assert generate_key_from_password.cache_info().currsize > 0
+
+        forget_keys()
+        assert generate_key_from_password.cache_info().currsize == 0
+        assert create_ciphers.cache_info().currsize == 0
+
+    def test_encrypt_files_share_one_salt_per_run(self):
+        """Test that files encrypted in one run share a salt and runs do not."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_paths = []
+            for run in range(2):
+                run_dir = os.path.join(temp_dir, f"run{run}")
+                os.mkdir(run_dir)
+                for i in range(2):
+                    file_path = os.path.join(run_dir, f"file{i}.txt")
+                    with open(file_path, 'wb') as f:
+                        f.write(self.test_content)
+                    file_paths.append(file_path)
+
+            assert encrypt_files(file_paths[:2], self.test_password, quiet=True) == file_paths[:2]
+            assert encrypt_files(file_paths[2:], self.test_password, quiet=True) == file_paths[2:]
+
+            salts = []
+            for run in range(2):
+                run_dir = os.path.join(temp_dir, f"run{run}")
+                for name in os.listdir(run_dir):
+                    if name.endswith('.kubli'):
+                        with open(os.path.join(run_dir, name), 'rb') as f:
+                            header = f.read(len(FILE_HEADER) + 1 + SALT_SIZE)
+                        salts.append((run, header[len(FILE_HEADER) + 1:]))
+
+            run_salts = [{salt for r, salt in salts if r == run} for run in range(2)]
+            assert [len(s) for s in run_salts] == [1, 1]
+            assert run_salts[0] != run_salts[1]
+
+    @pytest.mark.parametrize("size", [0, 1, 16, 17, 64])
+    def test_read_chunks(self, size):
+        """Test read_chunks splits a file into chunks and flags only the last one."""
+        content = os.urandom(size)
+        with tempfile.TemporaryFile() as f:
+            f.write(content)
+            f.seek(0)
+            chunks = [(bytes(chunk), last) for chunk, last in read_chunks(f, 16)]
+
+        assert b"".join(chunk for chunk, _ in chunks) == content
+        assert [last for _, last in chunks] == [False] * (len(chunks) - 1) + [True]
+        assert all(len(chunk) == 16 for chunk, _ in chunks[:-1])
+        assert 0 < len(chunks[-1][0]) <= 16 or size == 0
+
+    def test_thread_buffers_are_reused_per_thread(self):
+        """Test thread_buffers returns the same buffers on a thread and new ones on another."""
+        buffers = thread_buffers(32, 2)
+        assert len(buffers) == 2
+        assert all(isinstance(buffer, bytearray) and len(buffer) == 32 for buffer in buffers)
+        assert thread_buffers(32, 2) is buffers
+        assert thread_buffers(32, 1) is not buffers
+
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(thread_buffers, 32, 2).result() is not buffers
+
     def test_encrypt_filename(self):
         """Test filename encryption."""
-        encrypted_filename = encrypt_filename(self.test_filename, self.test_key)
+        encrypted_filename = encrypt_filename(self.test_filename, self.test_aessiv)
         
         # Should return a string
         assert isinstance(encrypted_filename, str)
@@ -53,18 +144,18 @@ class TestEncryption:
         # Should not be the same as original
         assert encrypted_filename != self.test_filename
         
-        # Should not contain '=' characters (replaced with '_')
+        # Should not contain '=' padding characters
         assert '=' not in encrypted_filename
+
+        # Should be deterministic for the same key
+        assert encrypt_filename(self.test_filename, self.test_aessiv) == encrypted_filename
         
         # Should be a valid base64-like string (letters, numbers, underscores)
-        import string
-        valid_chars = string.ascii_letters + string.digits + '_-'
-        assert all(c in valid_chars for c in encrypted_filename)
-
-    def test_encrypt_filename_with_invalid_key(self):
-        """Test filename encryption with invalid key."""
-        invalid_key = b"invalid_key"
-        result = encrypt_filename(self.test_filename, invalid_key)
+        assert set(encrypted_filename) <= _VALID_FILENAME_CHARS
+
+    def test_encrypt_filename_with_invalid_aessiv(self):
+        """Test filename encryption with an invalid AES-SIV instance."""
+        result = encrypt_filename(self.test_filename, None)
         assert result is None
 
     def test_encrypt_file(self):
@@ -76,7 +167,7 @@ class TestEncryption:
                 f.write(self.test_content)
             
             # Encrypt the file
-            result = encrypt_file(test_file_path, self.test_key)
+            result = encrypt_file(test_file_path, self.test_password, self.test_salt)
             assert result is True
             
             # Check that encrypted file was created
@@ -92,17 +183,86 @@ class TestEncryption:
                 encrypted_content = f.read()
             assert encrypted_content != self.test_content
 
+            # Encrypted file should start with the format header, flags and salt
+            assert encrypted_content.startswith(FILE_HEADER + b"\x00" + self.test_salt)
+
+    @pytest.mark.skipif(not hasattr(os, 'posix_fadvise'), reason="posix_fadvise not available")
+    def test_encrypt_file_advises_page_cache(self):
+        """Test encrypt_file hints sequential reads and drops both files from the cache."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_file_path = os.path.join(temp_dir, self.test_filename)
+            with open(test_file_path, 'wb') as f:
+                f.write(self.test_content)
+
+            with patch('os.posix_fadvise') as mock_fadvise:
+                assert encrypt_file(test_file_path, self.test_password, self.test_salt) is True
+
+            advice = [call.args[3] for call in mock_fadvise.call_args_list]
+            assert advice.count(os.POSIX_FADV_SEQUENTIAL) == 1
+            assert advice.count(os.POSIX_FADV_DONTNEED) == 2
+
+    def test_encrypt_file_deletes_original_only_on_success(self):
+        """Test encrypt_file deletes the original file only after it is encrypted."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_file_path = os.path.join(temp_dir, self.test_filename)
+            with open(test_file_path, 'wb') as f:
+                f.write(self.test_content)
+
+            with patch('utils.encryption.encrypt_filename', return_value=None):
+                result = encrypt_file(test_file_path, self.test_password, delete_original=True)
+            assert result is False
+            assert os.path.exists(test_file_path)
+
+            result = encrypt_file(test_file_path, self.test_password, self.test_salt, delete_original=True)
+            assert result is True
+            assert not os.path.exists(test_file_path)
+            assert len([f for f in os.listdir(temp_dir) if f.endswith('.kubli')]) == 1
+
+    def test_encrypt_file_does_not_replace_existing_file(self):
+        """Test encrypt_file keeps an existing .kubli file with the same name."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_file_path = os.path.join(temp_dir, self.test_filename)
+            with open(test_file_path, 'wb') as f:
+                f.write(self.test_content)
+            encrypted_file_path = test_file_path + '.kubli'
+            with open(encrypted_file_path, 'wb') as f:
+                f.write(b"earlier encrypted file")
+
+            with patch('builtins.print'):
+                result = encrypt_file(
+                    test_file_path, self.test_password, self.test_salt,
+                    hide_name=False, delete_original=True,
+                )
+            assert result is False
+
+            # Both files are kept and no temporary file remains
+            with open(encrypted_file_path, 'rb') as f:
+                assert f.read() == b"earlier encrypted file"
+            assert sorted(os.listdir(temp_dir)) == [self.test_filename, self.test_filename + '.kubli']
+
+    def test_encrypt_file_without_hard_links(self):
+        """Test encrypt_file on a filesystem that does not support hard links."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_file_path = os.path.join(temp_dir, self.test_filename)
+            with open(test_file_path, 'wb') as f:
+                f.write(self.test_content)
+
+            with patch('os.link', side_effect=PermissionError("Operation not permitted")):
+                result = encrypt_file(test_file_path, self.test_password, self.test_salt, hide_name=False)
+            assert result is True
+            assert sorted(os.listdir(temp_dir)) == [self.test_filename, self.test_filename + '.kubli']
+
     def test_encrypt_file_nonexistent(self):
         """Test encrypting a non-existent file."""
-        result = encrypt_file("/nonexistent/file.txt", self.test_key)
+        result = encrypt_file("/nonexistent/file.txt", self.test_password, self.test_salt)
         assert result is False
 
     @patch('builtins.input')
-    @patch('glob.glob')
+    @patch('os.scandir')
     @patch('os.getcwd')
-    @patch('os.path.exists')
+    @patch('os.path.isdir')
     @patch('os.path.isfile')
-    def test_encrypt_directory_empty_password(self, mock_isfile, mock_exists, mock_getcwd, mock_glob, mock_input):
+    def test_encrypt_directory_empty_password(self, mock_isfile, mock_isdir, mock_getcwd, mock_scandir, mock_input):
         """Test encrypt_directory with empty password."""
         mock_input.return_value = ""  # Empty password
         
@@ -113,11 +273,11 @@ class TestEncryption:
             mock_print.assert_any_call('\x1b[31mError: Encryption key cannot be empty!')
 
     @patch('builtins.input')
-    @patch('os.path.exists')
-    def test_encrypt_directory_nonexistent_directory(self, mock_exists, mock_input):
+    @patch('os.path.isdir')
+    def test_encrypt_directory_nonexistent_directory(self, mock_isdir, mock_input):
         """Test encrypt_directory with non-existent directory."""
         mock_input.side_effect = ["test_password", "/nonexistent/directory"]
-        mock_exists.return_value = False
+        mock_isdir.return_value = False
         
         with patch('builtins.print') as mock_print:
             encrypt_directory()
@@ -125,15 +285,15 @@ class TestEncryption:
             mock_print.assert_any_call('\x1b[31mError: Directory \'/nonexistent/directory\' does not exist!')
 
     @patch('builtins.input')
-    @patch('glob.glob')
+    @patch('os.scandir')
     @patch('os.getcwd')
-    @patch('os.path.exists')
-    def test_encrypt_directory_no_files(self, mock_exists, mock_getcwd, mock_glob, mock_input):
+    @patch('os.path.isdir')
+    def test_encrypt_directory_no_files(self, mock_isdir, mock_getcwd, mock_scandir, mock_input):
         """Test encrypt_directory with no files to encrypt."""
         mock_input.side_effect = ["test_password", ""]  # Use current directory
-        mock_exists.return_value = True
+        mock_isdir.return_value = True
         mock_getcwd.return_value = "/test/directory"
-        mock_glob.return_value = []  # No files found
+        mock_scandir.return_value.__enter__.return_value = []  # No files found
         
         with patch('builtins.print') as mock_print:
             encrypt_directory()
@@ -141,17 +301,43 @@ class TestEncryption:
             mock_print.assert_any_call('\x1b[33mNo files found to encrypt!')
 
     @patch('builtins.input')
-    @patch('glob.glob')
+    @patch('os.scandir')
+    @patch('os.path.isdir')
+    def test_encrypt_directory_unreadable_directory(self, mock_isdir, mock_scandir, mock_input):
+        """Test encrypt_directory when the directory cannot be listed."""
+        mock_input.side_effect = ["test_password", "/test/directory"]
+        mock_isdir.return_value = True
+        mock_scandir.side_effect = PermissionError("Permission denied")
+
+        with patch('builtins.print') as mock_print:
+            encrypt_directory()
+            mock_print.assert_any_call(
+                '\x1b[31mError reading directory /test/directory: Permission denied'
+            )
+            mock_print.assert_any_call('\x1b[33mNo files found to encrypt!')
+
+    def test_list_files_to_encrypt_skips_vanished_files(self, make_dir_entry):
+        """Test that a file removed during the listing is skipped."""
+        vanished = make_dir_entry("/test/directory/vanished.txt")
+        vanished.stat.side_effect = FileNotFoundError("No such file")
+        kept = make_dir_entry("/test/directory/kept.txt")
+
+        with patch('os.scandir') as mock_scandir:
+            mock_scandir.return_value.__enter__.return_value = [vanished, kept]
+            assert list_files_to_encrypt("/test/directory") == ["/test/directory/kept.txt"]
+
+    @patch('builtins.input')
+    @patch('os.scandir')
     @patch('os.getcwd')
-    @patch('os.path.exists')
+    @patch('os.path.isdir')
     @patch('os.path.isfile')
     @patch('os.path.basename')
-    def test_encrypt_directory_user_cancels(self, mock_basename, mock_isfile, mock_exists, mock_getcwd, mock_glob, mock_input):
+    def test_encrypt_directory_user_cancels(self, mock_basename, mock_isfile, mock_isdir, mock_getcwd, mock_scandir, mock_input, make_dir_entry):
         """Test encrypt_directory when user cancels operation."""
         mock_input.side_effect = ["test_password", "", "n"]  # Cancel operation
-        mock_exists.return_value = True
+        mock_isdir.return_value = True
         mock_getcwd.return_value = "/test/directory"
-        mock_glob.return_value = ["/test/directory/file1.txt"]
+        mock_scandir.return_value.__enter__.return_value = [make_dir_entry("/test/directory/file1.txt")]
         mock_isfile.return_value = True
         mock_basename.return_value = "file1.txt"
         
@@ -160,6 +346,89 @@ class TestEncryption:
             # Should print cancellation message
             mock_print.assert_any_call('\x1b[33mEncryption cancelled.')
 
+    @patch('builtins.input')
+    def test_encrypt_directory_encrypts_all_files(self, mock_input):
+        """Test encrypt_directory encrypts every eligible file in the directory."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_files = [f"file{i}.txt" for i in range(8)]
+            for filename in test_files:
+                with open(os.path.join(temp_dir, filename), 'wb') as f:
+                    f.write(f"Content of {filename}".encode())
+
+            # Password, directory, confirm, keep originals
+            mock_input.side_effect = [self.test_password, temp_dir, "y", "n"]
+
+            with patch('builtins.print') as mock_print:
+                encrypt_directory()
+                mock_print.assert_any_call(
+                    f'\n\x1b[32m\x1b[1mEncryption complete! {len(test_files)} files encrypted.'
+                )
+
+            encrypted_files = [f for f in os.listdir(temp_dir) if f.endswith('.kubli')]
+            assert len(encrypted_files) == len(test_files)
+
+    @patch('builtins.input')
+    def test_encrypt_directory_skips_ineligible_entries(self, mock_input):
+        """Test encrypt_directory skips scripts, encrypted, hidden files, directories and symlinks."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for filename in ["notes.txt", "kubli.py", "helper.py", "already.kubli", ".hidden"]:
+                with open(os.path.join(temp_dir, filename), 'w') as f:
+                    f.write(filename)
+            os.mkdir(os.path.join(temp_dir, "subdir"))
+            os.symlink(os.path.join(temp_dir, "notes.txt"), os.path.join(temp_dir, "link.txt"))
+
+            mock_input.side_effect = [self.test_password, temp_dir, "n"]
+
+            with patch('builtins.print') as mock_print:
+                encrypt_directory()
+                mock_print.assert_any_call('\n\x1b[34mFiles to encrypt (1):')
+                mock_print.assert_any_call('  - \x1b[37mnotes.txt')
+
+    @patch('builtins.input')
+    def test_encrypt_directory_lists_largest_files_first(self, mock_input):
+        """Test encrypt_directory orders files by size, largest first."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for filename, size in [("small.txt", 10), ("large.txt", 1000), ("medium.txt", 100)]:
+                with open(os.path.join(temp_dir, filename), 'wb') as f:
+                    f.write(b"x" * size)
+
+            mock_input.side_effect = [self.test_password, temp_dir, "n"]
+
+            with patch('builtins.print') as mock_print:
+                encrypt_directory()
+
+            # The listing is printed in a single call, one line per file
+            listed = [
+                call.args[0] for call in mock_print.call_args_list
+                if call.args and str(call.args[0]).startswith('  - ')
+            ]
+            assert len(listed) == 1
+            assert listed[0].split('\x1b[0m\n') == [
+                '  - \x1b[37mlarge.txt',
+                '  - \x1b[37mmedium.txt',
+                '  - \x1b[37msmall.txt',
+            ]
+
+    @patch('builtins.input')
+    def test_encrypt_directory_prints_status_at_once(self, mock_input):
+        """Test encrypt_directory prints all per-file status lines in one call."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for i in range(5):
+                with open(os.path.join(temp_dir, f"file{i}.txt"), 'wb') as f:
+                    f.write(b"x")
+
+            mock_input.side_effect = [self.test_password, temp_dir, "y", "n"]
+
+            with patch('builtins.print') as mock_print:
+                encrypt_directory()
+
+            status_calls = [
+                call.args[0] for call in mock_print.call_args_list
+                if call.args and 'Encrypting: ' in str(call.args[0])
+            ]
+            assert len(status_calls) == 1
+            assert status_calls[0].count('✓ Encrypted successfully') == 5
+
     def test_encrypt_file_integration(self):
         """Integration test for file encryption."""
         with tempfile.TemporaryDirectory() as temp_dir:
@@ -173,7 +442,7 @@ class TestEncryption:
             # Encrypt each file
             for filename in test_files:
                 file_path = os.path.join(temp_dir, filename)
-                result = encrypt_file(file_path, self.test_key)
+                result = encrypt_file(file_path, self.test_password, self.test_salt)
                 assert result is True
             
             # Verify encrypted files exist
@@ -1,5 +1,7 @@
 import pytest
+import hashlib
 import os
+import tarfile
 import tempfile
 import sys
 from unittest.mock import patch, MagicMock
@@ -9,29 +11,26 @@ from io import StringIO
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 import kubli
-from utils.encryption import generate_key_from_password, encrypt_file
+from utils.encryption import SALT_SIZE, encrypt_file, pack_files
 from utils.decryption import decrypt_file
 
 
 class TestKubliMain:
     """Integration tests for the main Kubli application."""
 
-    def test_display_banner(self):
+    def test_display_banner(self, capsys):
         """Test that the banner displays correctly."""
-        with patch('builtins.print') as mock_print:
-            kubli.display_banner()
-            
-            # Check that print was called multiple times (for the banner)
-            assert mock_print.call_count > 10
-            
-            # Check that version, author, and GitHub info are displayed
-            calls = [str(call) for call in mock_print.call_args_list]
-            banner_text = ' '.join(calls)
-            
-            assert 'v0.1.0' in banner_text
-            assert 'Ralph Joseph Castro' in banner_text
-            assert 'https://github.com/luhluh-17' in banner_text
-            assert 'kubli' in banner_text.lower()
+        kubli.display_banner()
+        banner_text = capsys.readouterr().out
+        
+        # Check that the banner spans multiple lines
+        assert banner_text.count('\n') > 10
+        
+        # Check that version, author, and GitHub info are displayed
+        assert 'v0.2.0' in banner_text
+        assert 'Ralph Joseph Castro' in banner_text
+        assert 'https://github.com/luhluh-17' in banner_text
+        assert 'kubli' in banner_text.lower()
 
     @patch('builtins.input')
     @patch('builtins.print')
@@ -84,12 +83,73 @@ class TestKubliMain:
     @patch('kubli.main_menu')
     def test_main_function(self, mock_main_menu, mock_display_banner):
         """Test the main function."""
-        kubli.main()
+        kubli.main([])
         
         # Should call both banner and main menu
         mock_display_banner.assert_called_once()
         mock_main_menu.assert_called_once()
 
+    @patch('kubli.display_banner')
+    @patch('kubli.main_menu')
+    def test_main_cli_roundtrip(self, mock_main_menu, mock_display_banner):
+        """Test encrypting and decrypting a directory from the command line."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_contents = {f"file{i}.txt": f"Content {i}".encode() for i in range(3)}
+            for filename, content in file_contents.items():
+                with open(os.path.join(temp_dir, filename), 'wb') as f:
+                    f.write(content)
+
+            with patch('builtins.print'):
+                assert kubli.main(["encrypt", "--dir", temp_dir, "--password", "cli_password"]) == 0
+            encrypted_files = os.listdir(temp_dir)
+            assert len(encrypted_files) == len(file_contents)
+            assert all(f.endswith('.kubli') for f in encrypted_files)
+
+            with patch('sys.stdin', StringIO("cli_password\n")), patch('builtins.print'):
+                assert kubli.main(["decrypt", "--dir", temp_dir, "--password-file", "-", "--keep-originals"]) == 0
+            assert len(os.listdir(temp_dir)) == 2 * len(file_contents)
+            for filename, content in file_contents.items():
+                with open(os.path.join(temp_dir, filename), 'rb') as f:
+                    assert f.read() == content
+
+            # The menu is not used when arguments are given
+            mock_display_banner.assert_not_called()
+            mock_main_menu.assert_not_called()
+
+    def test_main_cli_wrong_password_fails(self):
+        """Test that the command line reports failure with a wrong password."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with open(os.path.join(temp_dir, "file.txt"), 'wb') as f:
+                f.write(b"content")
+
+            with patch('builtins.print'):
+                assert kubli.main(["encrypt", "--dir", temp_dir, "--password", "right", "--quiet"]) == 0
+                assert kubli.main(["decrypt", "--dir", temp_dir, "--password", "wrong", "--quiet"]) == 1
+            assert len(os.listdir(temp_dir)) == 1
+
+    def test_main_cli_requires_password(self):
+        """Test that the command line rejects a missing or empty password."""
+        with patch('sys.stderr', StringIO()):
+            with pytest.raises(SystemExit):
+                kubli.main(["encrypt"])
+            with pytest.raises(SystemExit):
+                kubli.main(["encrypt", "--password", ""])
+            with patch.dict(os.environ, clear=True), pytest.raises(SystemExit):
+                kubli.main(["encrypt", "--password-env", "KUBLI_PASSWORD"])
+
+    def test_main_cli_password_from_environment(self):
+        """Test that the command line reads the password from an environment variable."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with open(os.path.join(temp_dir, "file.txt"), 'wb') as f:
+                f.write(b"content")
+
+            with patch.dict(os.environ, {"KUBLI_PASSWORD": "env_password"}), patch('builtins.print'):
+                assert kubli.main(["encrypt", "--dir", temp_dir, "--password-env", "KUBLI_PASSWORD"]) == 0
+                assert kubli.main(["decrypt", "--dir", temp_dir, "--password", "env_password"]) == 0
+
+            with open(os.path.join(temp_dir, "file.txt"), 'rb') as f:
+                assert f.read() == b"content"
+
 
 class TestKubliIntegration:
     """End-to-end integration tests."""
@@ -97,7 +157,7 @@ class TestKubliIntegration:
     def setup_method(self):
         """Set up test fixtures."""
         self.test_password = "integration_test_password"
-        self.test_key = generate_key_from_password(self.test_password)
+        self.test_salt = os.urandom(SALT_SIZE)
 
     def test_full_encryption_decryption_workflow(self):
         """Test complete workflow from file creation to encryption to decryption."""
@@ -118,7 +178,7 @@ class TestKubliIntegration:
             
             # Encrypt all files
             for file_path in file_paths:
-                result = encrypt_file(file_path, self.test_key)
+                result = encrypt_file(file_path, self.test_password, self.test_salt)
                 assert result is True
             
             # Remove original files
@@ -132,7 +192,7 @@ class TestKubliIntegration:
             # Decrypt all files
             for encrypted_file in encrypted_files:
                 encrypted_file_path = os.path.join(temp_dir, encrypted_file)
-                result = decrypt_file(encrypted_file_path, self.test_key)
+                result = decrypt_file(encrypted_file_path, self.test_password)
                 assert result is True
             
             # Verify all original files are restored with correct content
@@ -154,16 +214,14 @@ class TestKubliIntegration:
                 f.write(test_content)
             
             # Encrypt with correct password
-            correct_key = generate_key_from_password("correct_password")
-            result = encrypt_file(test_file, correct_key)
+            result = encrypt_file(test_file, "correct_password")
             assert result is True
             
             # Try to decrypt with wrong password
-            wrong_key = generate_key_from_password("wrong_password")
             encrypted_files = [f for f in os.listdir(temp_dir) if f.endswith('.kubli')]
             encrypted_file_path = os.path.join(temp_dir, encrypted_files[0])
             
-            result = decrypt_file(encrypted_file_path, wrong_key)
+            result = decrypt_file(encrypted_file_path, "wrong_password")
             assert result is False
 
     def test_empty_file_encryption_decryption(self):
@@ -175,7 +233,7 @@ class TestKubliIntegration:
                 pass  # Create empty file
             
             # Encrypt empty file
-            result = encrypt_file(empty_file, self.test_key)
+            result = encrypt_file(empty_file, self.test_password, self.test_salt)
             assert result is True
             
             # Remove original
@@ -184,7 +242,7 @@ class TestKubliIntegration:
             # Decrypt
             encrypted_files = [f for f in os.listdir(temp_dir) if f.endswith('.kubli')]
             encrypted_file_path = os.path.join(temp_dir, encrypted_files[0])
-            result = decrypt_file(encrypted_file_path, self.test_key)
+            result = decrypt_file(encrypted_file_path, self.test_password)
             assert result is True
             
             # Verify empty file is restored
@@ -194,15 +252,18 @@ class TestKubliIntegration:
     def test_large_file_encryption_decryption(self):
         """Test encryption and decryption of a larger file."""
         with tempfile.TemporaryDirectory() as temp_dir:
-            # Create a larger test file (1MB)
+            # Create a larger test file (1MB) from a repeated 64KB block
             large_file = os.path.join(temp_dir, "large_file.bin")
-            large_content = b"X" * (1024 * 1024)  # 1MB of 'X' characters
+            block = b"X" * (64 * 1024)
+            expected_digest = hashlib.sha256()
             
             with open(large_file, 'wb') as f:
-                f.write(large_content)
+                for _ in range(16):
+                    f.write(block)
+                    expected_digest.update(block)
             
             # Encrypt
-            result = encrypt_file(large_file, self.test_key)
+            result = encrypt_file(large_file, self.test_password, self.test_salt)
             assert result is True
             
             # Remove original
@@ -211,14 +272,146 @@ class TestKubliIntegration:
             # Decrypt
             encrypted_files = [f for f in os.listdir(temp_dir) if f.endswith('.kubli')]
             encrypted_file_path = os.path.join(temp_dir, encrypted_files[0])
-            result = decrypt_file(encrypted_file_path, self.test_key)
+            result = decrypt_file(encrypted_file_path, self.test_password)
             assert result is True
             
-            # Verify content
+            # Verify content without loading the whole file
             assert os.path.exists(large_file)
+            decrypted_digest = hashlib.sha256()
             with open(large_file, 'rb') as f:
-                decrypted_content = f.read()
-            assert decrypted_content == large_content
+                for block in iter(lambda: f.read(64 * 1024), b""):
+                    decrypted_digest.update(block)
+            assert decrypted_digest.digest() == expected_digest.digest()
+
+    @patch('utils.decryption.CHUNK_SIZE', 1024)
+    @patch('utils.encryption.CHUNK_SIZE', 1024)
+    def test_multi_chunk_file_encryption_decryption(self):
+        """Test encryption and decryption of a file spanning several chunks."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            multi_chunk_file = os.path.join(temp_dir, "multi_chunk.bin")
+            content = os.urandom(1024 * 5 + 100)
+
+            with open(multi_chunk_file, 'wb') as f:
+                f.write(content)
+
+            # Encrypt
+            result = encrypt_file(multi_chunk_file, self.test_password, self.test_salt)
+            assert result is True
+
+            # Remove original
+            os.remove(multi_chunk_file)
+
+            # Decrypt
+            encrypted_files = [f for f in os.listdir(temp_dir) if f.endswith('.kubli')]
+            encrypted_file_path = os.path.join(temp_dir, encrypted_files[0])
+            result = decrypt_file(encrypted_file_path, self.test_password)
+            assert result is True
+
+            # Verify content
+            with open(multi_chunk_file, 'rb') as f:
+                assert f.read() == content
+
+    @pytest.mark.skipif(not hasattr(os, 'posix_fallocate'), reason="posix_fallocate not available")
+    @patch('utils.decryption.CHUNK_SIZE', 1024)
+    @patch('utils.encryption.CHUNK_SIZE', 1024)
+    def test_preallocated_space_is_truncated(self):
+        """Test files are trimmed to their real size when more space was preallocated."""
+        real_fallocate = os.posix_fallocate
+
+        def overallocate(fd, offset, length):
+            real_fallocate(fd, offset, length + 4096)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, "preallocated.bin")
+            content = os.urandom(1024 * 3 + 10)
+            with open(file_path, 'wb') as f:
+                f.write(content)
+
+            with patch('os.posix_fallocate', side_effect=overallocate) as mock_fallocate:
+                assert encrypt_file(file_path, self.test_password, self.test_salt) is True
+                os.remove(file_path)
+
+                encrypted_files = [f for f in os.listdir(temp_dir) if f.endswith('.kubli')]
+                encrypted_file_path = os.path.join(temp_dir, encrypted_files[0])
+                assert decrypt_file(encrypted_file_path, self.test_password) is True
+                assert mock_fallocate.call_count == 2
+
+            with open(file_path, 'rb') as f:
+                assert f.read() == content
+
+    @patch('utils.decryption.CHUNK_SIZE', 1024)
+    @patch('utils.encryption.CHUNK_SIZE', 1024)
+    def test_pack_files_decrypts_to_tar_archive(self):
+        """Test packed files decrypt to a tar archive holding every file."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_contents = {f"file{i}.bin": os.urandom(700 * i) for i in range(5)}
+            file_paths = []
+            for filename, content in file_contents.items():
+                file_path = os.path.join(temp_dir, filename)
+                with open(file_path, 'wb') as f:
+                    f.write(content)
+                file_paths.append(file_path)
+
+            assert pack_files(file_paths, temp_dir, self.test_password) is True
+            for file_path in file_paths:
+                os.remove(file_path)
+
+            encrypted_files = [f for f in os.listdir(temp_dir) if f.endswith('.kubli')]
+            assert len(encrypted_files) == 1
+            encrypted_file_path = os.path.join(temp_dir, encrypted_files[0])
+            assert decrypt_file(encrypted_file_path, self.test_password) is True
+
+            archives = [f for f in os.listdir(temp_dir) if f.endswith('.tar')]
+            assert len(archives) == 1
+            assert archives[0].startswith('kubli-pack-')
+            with tarfile.open(os.path.join(temp_dir, archives[0])) as archive:
+                assert sorted(archive.getnames()) == sorted(file_contents)
+                for filename, content in file_contents.items():
+                    assert archive.extractfile(filename).read() == content
+
+    def test_pack_files_archives_decrypt_to_different_names(self):
+        """Test two packs in one directory decrypt to separate archives."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_contents = {"a.txt": b"first pack", "b.txt": b"second pack"}
+            for filename, content in file_contents.items():
+                file_path = os.path.join(temp_dir, filename)
+                with open(file_path, 'wb') as f:
+                    f.write(content)
+                assert pack_files([file_path], temp_dir, self.test_password) is True
+                os.remove(file_path)
+
+            encrypted_files = [f for f in os.listdir(temp_dir) if f.endswith('.kubli')]
+            assert len(encrypted_files) == 2
+            for encrypted_file in encrypted_files:
+                encrypted_file_path = os.path.join(temp_dir, encrypted_file)
+                assert decrypt_file(
+                    encrypted_file_path, self.test_password, delete_encrypted=True
+                ) is True
+
+            packed = {}
+            for archive_name in os.listdir(temp_dir):
+                with tarfile.open(os.path.join(temp_dir, archive_name)) as archive:
+                    for member in archive.getnames():
+                        packed[member] = archive.extractfile(member).read()
+            assert packed == file_contents
+
+    @patch('utils.encryption.PACK_FILENAME', "kubli-pack.tar")
+    def test_pack_files_does_not_replace_existing_archive(self):
+        """Test packing again never replaces an archive with the same name."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, "file.txt")
+            with open(file_path, 'wb') as f:
+                f.write(b"packed content")
+
+            assert pack_files([file_path], temp_dir, self.test_password, hide_name=False) is True
+            archive_path = os.path.join(temp_dir, "kubli-pack.tar.kubli")
+            with open(archive_path, 'rb') as f:
+                archive_content = f.read()
+
+            with patch('builtins.print'):
+                assert pack_files([], temp_dir, self.test_password, hide_name=False) is False
+            with open(archive_path, 'rb') as f:
+                assert f.read() == archive_content
 
     def test_special_characters_in_filename(self):
         """Test encryption/decryption with special characters in filename."""
@@ -232,7 +425,7 @@ class TestKubliIntegration:
                 f.write(test_content)
             
             # Encrypt
-            result = encrypt_file(special_file, self.test_key)
+            result = encrypt_file(special_file, self.test_password, self.test_salt)
             assert result is True
             
             # Remove original
@@ -241,7 +434,7 @@ class TestKubliIntegration:
             # Decrypt
             encrypted_files = [f for f in os.listdir(temp_dir) if f.endswith('.kubli')]
             encrypted_file_path = os.path.join(temp_dir, encrypted_files[0])
-            result = decrypt_file(encrypted_file_path, self.test_key)
+            result = decrypt_file(encrypted_file_path, self.test_password)
             assert result is True
             
             # Verify restoration
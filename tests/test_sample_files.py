@@ -7,7 +7,31 @@ from unittest.mock import patch
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from utils.decryption import decrypt_file
-from utils.encryption import generate_key_from_password
+from utils.encryption import FILE_HEADER
+
+
+# Common file headers that encrypted content should never start with
+_PLAIN_TEXT_HEADERS = (
+    b'<!DOCTYPE',  # HTML
+    b'<html',      # HTML
+    b'<?xml',      # XML
+    b'%PDF',       # PDF
+    b'\x89PNG',    # PNG
+    b'\xff\xd8',   # JPEG
+    b'PK',         # ZIP
+)
+_PLAIN_TEXT_HEADER_SIZE = max(map(len, _PLAIN_TEXT_HEADERS))
+
+# Characters of unpadded URL-safe base64 used in encrypted filenames
+_FILENAME_CHARS = b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-'
+
+_SAMPLE_DIR = os.path.join(os.path.dirname(__file__), '..', 'sample')
+
+
+@pytest.fixture(scope="module")
+def sample_files():
+    """List the sample .kubli files once for all tests in this module."""
+    return sorted(f for f in os.listdir(_SAMPLE_DIR) if f.endswith('.kubli'))
 
 
 class TestSampleFiles:
@@ -15,16 +39,15 @@ class TestSampleFiles:
 
     def setup_method(self):
         """Set up test fixtures."""
-        self.sample_dir = os.path.join(os.path.dirname(__file__), '..', 'sample')
+        self.sample_dir = _SAMPLE_DIR
         
     def test_sample_directory_exists(self):
         """Test that the sample directory exists."""
         assert os.path.exists(self.sample_dir)
         assert os.path.isdir(self.sample_dir)
     
-    def test_sample_files_exist(self):
+    def test_sample_files_exist(self, sample_files):
         """Test that sample encrypted files exist."""
-        sample_files = [f for f in os.listdir(self.sample_dir) if f.endswith('.kubli')]
         assert len(sample_files) > 0, "No sample .kubli files found"
         
         # Verify each sample file exists and has content
@@ -33,44 +56,34 @@ class TestSampleFiles:
             assert os.path.exists(file_path)
             assert os.path.getsize(file_path) > 0, f"Sample file {sample_file} is empty"
     
-    def test_sample_filenames_format(self):
+    def test_sample_filenames_format(self, sample_files):
         """Test that sample filenames follow expected encrypted format."""
-        sample_files = [f for f in os.listdir(self.sample_dir) if f.endswith('.kubli')]
-        
         for sample_file in sample_files:
             # Remove .kubli extension to get encrypted filename
             encrypted_name = sample_file.replace('.kubli', '')
             
-            # Should be base64-like (letters, numbers, underscores, hyphens)
-            allowed_chars = set('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-')
-            filename_chars = set(encrypted_name)
-            assert filename_chars.issubset(allowed_chars), f"Invalid characters in {sample_file}"
+            # Should be base64-like (letters, numbers, underscores, hyphens):
+            # nothing is left once the allowed characters are deleted
+            invalid_chars = encrypted_name.encode().translate(None, _FILENAME_CHARS)
+            assert not invalid_chars, f"Invalid characters in {sample_file}"
     
-    def test_sample_files_are_encrypted(self):
+    def test_sample_files_are_encrypted(self, sample_files):
         """Test that sample files appear to be properly encrypted."""
-        sample_files = [f for f in os.listdir(self.sample_dir) if f.endswith('.kubli')]
-        
         for sample_file in sample_files:
             file_path = os.path.join(self.sample_dir, sample_file)
             
-            # Read the file content
+            # Only the start of the file is compared against the headers
             with open(file_path, 'rb') as f:
-                content = f.read()
+                content = f.read(_PLAIN_TEXT_HEADER_SIZE)
             
             # Encrypted content should not contain obvious plain text patterns
-            # Check that it doesn't start with common file headers
-            plain_text_headers = [
-                b'<!DOCTYPE',  # HTML
-                b'<html',      # HTML
-                b'<?xml',      # XML
-                b'%PDF',       # PDF
-                b'\x89PNG',    # PNG
-                b'\xff\xd8',   # JPEG
-                b'PK',         # ZIP
-            ]
-            
-            for header in plain_text_headers:
-                assert not content.startswith(header), f"File {sample_file} appears to contain plain text"
+            assert not content.startswith(_PLAIN_TEXT_HEADERS), f"File {sample_file} appears to contain plain text"
+    
+    def test_sample_files_use_current_format(self, sample_files):
+        """Test that sample files are written in the current format version."""
+        for sample_file in sample_files:
+            with open(os.path.join(self.sample_dir, sample_file), 'rb') as f:
+                assert f.read(len(FILE_HEADER)) == FILE_HEADER, f"File {sample_file} uses an outdated format"
     
     @pytest.mark.parametrize("test_password", [
         "wrong_password",
@@ -79,10 +92,8 @@ class TestSampleFiles:
         "password",
         "",
     ])
-    def test_sample_files_decrypt_with_wrong_passwords(self, test_password):
+    def test_sample_files_decrypt_with_wrong_passwords(self, sample_files, test_password):
         """Test that sample files cannot be decrypted with common wrong passwords."""
-        sample_files = [f for f in os.listdir(self.sample_dir) if f.endswith('.kubli')]
-        
         if not sample_files:
             pytest.skip("No sample files to test")
         
@@ -90,17 +101,12 @@ class TestSampleFiles:
         sample_file = sample_files[0]
         file_path = os.path.join(self.sample_dir, sample_file)
         
-        # Generate key from test password
-        test_key = generate_key_from_password(test_password)
-        
         # Should fail to decrypt
-        result = decrypt_file(file_path, test_key)
+        result = decrypt_file(file_path, test_password)
         assert result is False, f"Sample file was unexpectedly decrypted with password: {test_password}"
     
-    def test_sample_file_structure_integrity(self):
+    def test_sample_file_structure_integrity(self, sample_files):
         """Test the structural integrity of sample files."""
-        sample_files = [f for f in os.listdir(self.sample_dir) if f.endswith('.kubli')]
-        
         for sample_file in sample_files:
             file_path = os.path.join(self.sample_dir, sample_file)
             
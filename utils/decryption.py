@@ -1,22 +1,41 @@
 import os
-import glob
-from cryptography.fernet import Fernet
 import base64
+from contextlib import suppress
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 from colorama import Fore, Style
-from .encryption import generate_key_from_password
-
-
-def decrypt_filename(encrypted_filename, key):
+from .encryption import (
+    CHUNK_SIZE,
+    FILE_HEADER,
+    FLAG_PLAIN_NAME,
+    HEADER_SIZE,
+    MAX_WORKERS,
+    SALT_SIZE,
+    TAG_SIZE,
+    advise_sequential,
+    atomic_write,
+    chunk_nonce,
+    delete_files,
+    drop_from_cache,
+    load_ciphers,
+    preallocate,
+    print_lines,
+    read_chunks,
+    thread_buffers,
+)
+
+
+def decrypt_filename(encrypted_filename, aessiv):
     """
-    Decrypt a filename using Fernet decryption.
+    Decrypt a filename using AES-SIV decryption.
 
     Restores the original filename by reversing the encryption process:
-    replaces underscores with padding characters, decodes from base64,
-    and decrypts using the provided key.
+    restores the stripped base64 padding, decodes the ciphertext and decrypts
+    it using the provided AES-SIV instance.
 
     Args:
         encrypted_filename (str): The encrypted filename to decrypt
-        key (bytes): The Fernet decryption key
+        aessiv (AESSIV): The AES-SIV instance used for decryption
 
     Returns:
         str: The original decrypted filename, or None if decryption fails
@@ -25,28 +44,102 @@ def decrypt_filename(encrypted_filename, key):
         Exception: Prints error message and returns None if decryption fails
     """
     try:
-        fernet = Fernet(key)
-        # Restore padding and decode
-        padded_filename = encrypted_filename.replace("_", "=")
-        encrypted_data = base64.urlsafe_b64decode(padded_filename)
-        decrypted_filename = fernet.decrypt(encrypted_data).decode()
+        # Restore padding
+        token = encrypted_filename.encode("ascii")
+        ciphertext = base64.urlsafe_b64decode(token + b"=" * (-len(token) % 4))
+        decrypted_filename = aessiv.decrypt(ciphertext, None).decode()
         return decrypted_filename
     except Exception as e:
         print(f"{Fore.RED}Error decrypting filename: {e}")
         return None
 
 
-def decrypt_file(file_path, key):
+def read_header(encrypted_file):
+    """
+    Read and check the header at the start of an encrypted file.
+
+    Args:
+        encrypted_file (file): The encrypted file, positioned at its start
+
+    Returns:
+        tuple: The (associated_data, flags, salt, nonce_prefix) of the file,
+            where associated_data is the header, flags and salt authenticated
+            with every chunk
+
+    Raises:
+        ValueError: If the file does not start with a supported header
+    """
+    header = encrypted_file.read(HEADER_SIZE)
+    if len(header) != HEADER_SIZE or not header.startswith(FILE_HEADER):
+        raise ValueError("unsupported file format")
+    associated_data = header[: len(FILE_HEADER) + 1 + SALT_SIZE]
+    flags = associated_data[len(FILE_HEADER)]
+    salt = associated_data[len(FILE_HEADER) + 1 :]
+    return associated_data, flags, salt, header[len(associated_data) :]
+
+
+def stored_filename(encrypted_filename, flags, aessiv):
+    """
+    Get the original filename of an encrypted file from its name and flags.
+
+    Args:
+        encrypted_filename (str): The name of the .kubli file
+        flags (int): The flags from the file header
+        aessiv (AESSIV): The AES-SIV instance used for the filename
+
+    Returns:
+        str: The original filename, or None if it cannot be decrypted
+    """
+    # Strip the suffix once by slicing; the stem is either the plain name or
+    # the encrypted one
+    stem = encrypted_filename[: -len(".kubli")]
+    if flags & FLAG_PLAIN_NAME:
+        return stem
+    return decrypt_filename(stem, aessiv)
+
+
+def read_original_filename(file_path, password):
+    """
+    Get the original filename of an encrypted file for display.
+
+    Args:
+        file_path (str): Path to the encrypted .kubli file
+        password (str): The password the file was encrypted with
+
+    Returns:
+        str: The original filename, or None if it cannot be determined
+    """
+    try:
+        with open(file_path, "rb") as encrypted_file:
+            _, flags, salt, _ = read_header(encrypted_file)
+    except (OSError, ValueError):
+        return None
+    aessiv, _ = load_ciphers(password, salt)
+    return stored_filename(os.path.basename(file_path), flags, aessiv)
+
+
+def decrypt_file(file_path, password, original_filename=None, delete_encrypted=False):
     """
     Decrypt a single file with filename decryption.
 
-    Decrypts both the file content and filename using Fernet decryption.
-    Reads a .kubli encrypted file, decrypts its content and filename,
-    then creates the original file with restored name and content.
+    Decrypts the file content with AES-GCM and the filename with AES-SIV.
+    Reads a .kubli encrypted file, checks its header, decrypts its filename
+    unless it was stored in plain text, then streams the content chunk by
+    chunk into the original file. Each chunk
+    is authenticated before it is written, and the output is written
+    atomically so a failure never leaves a partial or clobbered file behind.
+    An existing file with the original name is never replaced; the file fails
+    instead and the encrypted file is kept.
+    The key is derived from the password and the salt in the header once per
+    salt and shared across files.
 
     Args:
         file_path (str): Path to the encrypted .kubli file to decrypt
-        key (bytes): The Fernet decryption key
+        password (str): The password the file was encrypted with
+        original_filename (str, optional): The already decrypted filename, if
+            known, so it is not decrypted a second time
+        delete_encrypted (bool, optional): Whether to delete the encrypted file
+            once the decrypted file is safely written
 
     Returns:
         bool: True if decryption successful, False if failed
@@ -54,33 +147,146 @@ def decrypt_file(file_path, key):
     Raises:
         Exception: Prints error message and returns False if decryption fails
     """
-    try:
-        fernet = Fernet(key)
+    # Reject names that cannot be encrypted files before opening them
+    directory, encrypted_filename = os.path.split(file_path)
+    if not encrypted_filename.endswith(".kubli") or encrypted_filename == ".kubli":
+        print(f"{Fore.RED}Error decrypting {file_path}: not a .kubli file")
+        return False
 
-        # Read and decrypt file content
+    try:
         with open(file_path, "rb") as encrypted_file:
-            encrypted_data = encrypted_file.read()
+            advise_sequential(encrypted_file)
+            associated_data, flags, salt, nonce_prefix = read_header(encrypted_file)
+            aessiv, aesgcm = load_ciphers(password, salt)
+
+            # Decrypt filename unless the caller already did
+            if original_filename is None:
+                original_filename = stored_filename(encrypted_filename, flags, aessiv)
+
+            if original_filename is None:
+                return False
+
+            # Create original file path
+            original_file_path = os.path.join(directory, original_filename)
+
+            with atomic_write(original_file_path) as decrypted_file:
+                # Every chunk but a truncated last one carries a tag
+                size = os.fstat(encrypted_file.fileno()).st_size - HEADER_SIZE
+                chunk_count = max(1, -(-size // (CHUNK_SIZE + TAG_SIZE)))
+                preallocate(decrypted_file, size - chunk_count * TAG_SIZE)
+
+                # The output buffer is reused for every chunk and every file
+                # instead of allocating new bytes
+                out_buffer = memoryview(thread_buffers(CHUNK_SIZE, 1)[0])
+                chunks = read_chunks(encrypted_file, CHUNK_SIZE + TAG_SIZE)
+                for index, (chunk, last) in enumerate(chunks):
+                    if len(chunk) < TAG_SIZE:
+                        raise ValueError("encrypted file is truncated")
+                    nonce = chunk_nonce(nonce_prefix, index, last)
+                    written = aesgcm.decrypt_into(
+                        nonce,
+                        chunk,
+                        associated_data,
+                        out_buffer[: len(chunk) - TAG_SIZE],
+                    )
+                    decrypted_file.write(out_buffer[:written])
+                decrypted_file.truncate()
+
+            drop_from_cache(encrypted_file)
+
+        if delete_encrypted:
+            delete_files([file_path], quiet=True)
 
-        decrypted_data = fernet.decrypt(encrypted_data)
+        return True
+    except Exception as e:
+        print(f"{Fore.RED}Error decrypting {file_path}: {e}")
+        return False
 
-        # Decrypt filename
-        encrypted_filename = os.path.basename(file_path).replace(".kubli", "")
-        original_filename = decrypt_filename(encrypted_filename, key)
 
-        if original_filename is None:
-            return False
+def list_encrypted_files(directory):
+    """
+    List the .kubli encrypted files in a directory.
 
-        # Create original file path
-        directory = os.path.dirname(file_path)
-        original_file_path = os.path.join(directory, original_filename)
+    Args:
+        directory (str): The directory to scan
 
-        with open(original_file_path, "wb") as decrypted_file:
-            decrypted_file.write(decrypted_data)
+    Returns:
+        list: The paths of the encrypted files, largest first
+    """
+    sized_files = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".kubli"):
+                    continue
+                # Skip files removed or made unreadable since the listing
+                with suppress(OSError):
+                    if entry.is_file(follow_symlinks=False):
+                        size = entry.stat(follow_symlinks=False).st_size
+                        sized_files.append((size, entry.path))
+    except OSError as e:
+        print(f"{Fore.RED}Error reading directory {directory}: {e}")
+        return []
+
+    # Process the largest files first so a big file does not start last and
+    # keep one worker busy after the others have finished
+    return [path for _, path in sorted(sized_files, reverse=True)]
+
+
+def decrypt_files(
+    file_paths,
+    password,
+    original_filenames=None,
+    max_workers=MAX_WORKERS,
+    quiet=False,
+    delete_encrypted=False,
+):
+    """
+    Decrypt several files concurrently and report the result for each file.
 
-        return True
-    except Exception as e:
-        print(f"{Fore.RED}Error decrypting {file_path}: {e}")
-        return False
+    Args:
+        file_paths (list): Paths of the encrypted .kubli files to decrypt
+        password (str): The password the files were encrypted with
+        original_filenames (dict, optional): Already decrypted filenames keyed
+            by encrypted file path, so they are not decrypted a second time
+        max_workers (int, optional): Number of files decrypted at the same time
+        quiet (bool, optional): Whether to skip printing the per-file results
+        delete_encrypted (bool, optional): Whether to delete each encrypted file
+            as soon as it is decrypted
+
+    Returns:
+        list: The paths of the encrypted files that were decrypted successfully
+    """
+    if original_filenames is None:
+        original_filenames = {}
+
+    # Decrypt files concurrently (the crypto runs in C and releases the GIL)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(
+            executor.map(
+                decrypt_file,
+                file_paths,
+                repeat(password),
+                map(original_filenames.get, file_paths),
+                repeat(delete_encrypted),
+            )
+        )
+
+    # Collect the per-file status lines and print them at once, so large
+    # directories do not pay for one terminal write per line
+    successful_decryptions = []
+    status_lines = []
+    for file_path, success in zip(file_paths, results):
+        status_lines.append(f"Decrypting: {Fore.WHITE}{os.path.basename(file_path)}")
+        if success:
+            successful_decryptions.append(file_path)
+            status_lines.append(f"  {Fore.GREEN}✓ Decrypted successfully")
+        else:
+            status_lines.append(f"  {Fore.RED}✗ Failed to decrypt (wrong key?)")
+    if not quiet:
+        print_lines(status_lines)
+
+    return successful_decryptions
 
 
 def decrypt_directory():
@@ -98,8 +304,9 @@ def decrypt_directory():
         3. Scans for .kubli encrypted files
         4. Shows list of encrypted files with decrypted filename preview
         5. Asks for confirmation before proceeding
-        6. Decrypts each file using Fernet decryption
-        7. Optionally deletes encrypted files after successful decryption
+        6. Asks whether to delete the encrypted files after decryption
+        7. Decrypts the files concurrently using AES-GCM decryption, deleting
+           each encrypted file as soon as it is decrypted if requested
         8. Reports decryption results
 
     Returns:
@@ -117,8 +324,6 @@ def decrypt_directory():
         print(f"{Fore.RED}Error: Decryption key cannot be empty!")
         return
 
-    key = generate_key_from_password(password)
-
     # Get current directory
     directory = input(
         f"{Fore.YELLOW}Enter directory path (or press Enter for current directory): "
@@ -126,58 +331,52 @@ def decrypt_directory():
     if not directory:
         directory = os.getcwd()
 
-    if not os.path.exists(directory):
+    if not os.path.isdir(directory):
         print(f"{Fore.RED}Error: Directory '{directory}' does not exist!")
         return
 
-    # List all encrypted files in directory
-    encrypted_files = glob.glob(os.path.join(directory, "*.kubli"))
+    encrypted_files = list_encrypted_files(directory)
 
     if not encrypted_files:
         print(f"{Fore.YELLOW}No encrypted files found!")
         return
 
     print(f"\n{Fore.BLUE}Encrypted files found ({len(encrypted_files)}):")
+    # Decrypt each filename once; the names are reused when decrypting the files
+    original_filenames = {}
+    preview_lines = []
     for file_path in encrypted_files:
         # Try to decrypt filename for display
-        encrypted_filename = os.path.basename(file_path).replace(".kubli", "")
-        original_filename = decrypt_filename(encrypted_filename, key)
+        encrypted_filename = os.path.basename(file_path)
+        original_filename = read_original_filename(file_path, password)
+        original_filenames[file_path] = original_filename
         if original_filename:
-            print(
-                f"  - {Fore.MAGENTA}{os.path.basename(file_path)} {Fore.CYAN}→ {Fore.GREEN}{original_filename}"
+            preview_lines.append(
+                f"  - {Fore.MAGENTA}{encrypted_filename} {Fore.CYAN}→ {Fore.GREEN}{original_filename}"
             )
         else:
-            print(
-                f"  - {Fore.MAGENTA}{os.path.basename(file_path)} {Fore.RED}(filename decryption failed)"
+            preview_lines.append(
+                f"  - {Fore.MAGENTA}{encrypted_filename} {Fore.RED}(filename decryption failed)"
             )
+    print_lines(preview_lines)
 
     confirm = input(f"\n{Fore.YELLOW}Proceed with decryption? (y/N): ").lower()
     if confirm != "y":
         print(f"{Fore.YELLOW}Decryption cancelled.")
         return
 
-    # Decrypt files
-    successful_decryptions = []
-    for file_path in encrypted_files:
-        print(f"Decrypting: {Fore.WHITE}{os.path.basename(file_path)}")
-        if decrypt_file(file_path, key):
-            successful_decryptions.append(file_path)
-            print(f"  {Fore.GREEN}✓ Decrypted successfully")
-        else:
-            print(f"  {Fore.RED}✗ Failed to decrypt (wrong key?)")
-
-    # Delete encrypted files if decryption was successful
-    if successful_decryptions:
-        delete_confirm = input(
-            f"\n{Fore.YELLOW}Delete {len(successful_decryptions)} encrypted files? (y/N): "
-        ).lower()
-        if delete_confirm == "y":
-            for file_path in successful_decryptions:
-                try:
-                    os.remove(file_path)
-                    print(f"{Fore.GREEN}Deleted: {os.path.basename(file_path)}")
-                except Exception as e:
-                    print(f"{Fore.RED}Error deleting {file_path}: {e}")
+    # Ask before decrypting, so each encrypted file can be deleted as soon as
+    # it is decrypted instead of in a second pass
+    delete_confirm = input(
+        f"{Fore.YELLOW}Delete encrypted files after decryption? (y/N): "
+    ).lower()
+
+    successful_decryptions = decrypt_files(
+        encrypted_files,
+        password,
+        original_filenames,
+        delete_encrypted=delete_confirm == "y",
+    )
 
     print(
         f"\n{Fore.GREEN}{Style.BRIGHT}Decryption complete! {len(successful_decryptions)} files decrypted."
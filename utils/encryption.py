@@ -1,39 +1,343 @@
 import os
-import glob
-from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, AESSIV
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 import base64
-import hashlib
+import functools
+import tarfile
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, suppress
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 from colorama import Fore, Style
 
-
-def generate_key_from_password(password):
+# Number of worker threads used to process files concurrently
+MAX_WORKERS = min(32, os.cpu_count() or 4)
+
+# Every encrypted file starts with the magic bytes and the format version,
+# followed by a flags byte and the scrypt salt, which are authenticated along
+# with the content. The version is bumped whenever the header layout changes
+# (version 1 had no flags byte and version 2 no salt), so older files are
+# reported as unsupported instead of misparsed.
+FILE_MAGIC = b"KUBLI"
+FORMAT_VERSION = 3
+FILE_HEADER = FILE_MAGIC + bytes([FORMAT_VERSION])
+
+# Set when the original filename was kept instead of being encrypted
+FLAG_PLAIN_NAME = 0x01
+
+# scrypt parameters used to stretch passwords into keys (about 32 MiB and
+# 100 ms per derivation). A random salt is generated for every encryption run
+# and stored in the header of each file, so one precomputed dictionary cannot
+# be used against every kubli file.
+SALT_SIZE = 16
+KDF_N = 2**15
+KDF_R = 8
+KDF_P = 1
+
+# File contents are streamed and encrypted in chunks of CHUNK_SIZE bytes.
+# Each chunk nonce is a random per-file prefix, the chunk index and a flag
+# marking the final chunk, so chunks cannot be reordered or truncated.
+CHUNK_SIZE = 1024 * 1024
+NONCE_PREFIX_SIZE = 7
+TAG_SIZE = 16
+
+# Size of the header, flags byte, salt and nonce prefix that precede the chunks
+HEADER_SIZE = len(FILE_HEADER) + 1 + SALT_SIZE + NONCE_PREFIX_SIZE
+
+# Files with these suffixes are never encrypted: already encrypted files and
+# Python files, which include the kubli.py script itself
+EXCLUDED_SUFFIXES = (".kubli", ".py")
+
+# Name of the archive that packed files are stored in before encryption. The
+# creation time and a random suffix keep archives from different runs from
+# decrypting to the same name.
+PACK_FILENAME = "kubli-pack-{timestamp}-{suffix}.tar"
+
+# The process umask, read once at import since os.umask can only be read by
+# setting it. New files get the same mode as a plain open() would give them.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# Chunk buffers kept by each worker thread and reused for every file it handles
+_thread_buffers = threading.local()
+
+# Serializes key derivation, so worker threads that need the key for the same
+# salt at the same time wait for one derivation instead of each running scrypt
+_key_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=64)
+def generate_key_from_password(password, salt):
     """
-    Generate a Fernet-compatible encryption key from a password.
+    Generate an encryption key from a password and salt.
 
-    Converts a user password into a cryptographic key using SHA-256 hashing
-    and base64 URL-safe encoding for use with the Fernet encryption algorithm.
+    Stretches a user password into a cryptographic key with scrypt, a
+    memory-hard key derivation function that makes brute forcing passwords
+    expensive. Results are cached, so the slow derivation runs only once per
+    password and salt. The cache keeps the passwords it is keyed on in memory
+    until forget_keys is called.
 
     Args:
         password (str): The user password to convert into an encryption key
+        salt (bytes): The SALT_SIZE-byte salt stored in the file header
+
+    Returns:
+        bytes: A 32-byte key suitable for create_ciphers
+    """
+    return Scrypt(salt=salt, length=32, n=KDF_N, r=KDF_R, p=KDF_P).derive(
+        password.encode()
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def create_ciphers(key):
+    """
+    Build the ciphers used for filenames and file contents from a key.
+
+    Filenames are encrypted with AES-SIV, which is deterministic and adds only a
+    16-byte tag to each name. File contents are encrypted with AES-256-GCM,
+    which runs in a single pass on AES-NI hardware. Each cipher uses its own
+    subkey derived from the key with HKDF. Results are cached per key, and the
+    returned ciphers are safe to share between threads.
+
+    Args:
+        key (bytes): A key returned by generate_key_from_password
+
+    Returns:
+        tuple: The (AESSIV, AESGCM) instances for filenames and contents
+    """
+    filename_key = HKDF(
+        algorithm=hashes.SHA256(), length=64, salt=None, info=b"kubli-filename"
+    ).derive(key)
+    content_key = HKDF(
+        algorithm=hashes.SHA256(), length=32, salt=None, info=b"kubli-content"
+    ).derive(key)
+    return AESSIV(filename_key), AESGCM(content_key)
+
+
+def load_ciphers(password, salt):
+    """
+    Get the ciphers for a password and salt, deriving the key at most once.
+
+    Args:
+        password (str): The user password
+        salt (bytes): The salt of the encryption run the ciphers are for
+
+    Returns:
+        tuple: The (AESSIV, AESGCM) instances for filenames and contents
+    """
+    with _key_lock:
+        return create_ciphers(generate_key_from_password(password, salt))
+
+
+def forget_keys():
+    """
+    Drop the cached keys and ciphers, along with the passwords they came from.
+
+    Called once an operation is done, so passwords are only kept in memory
+    while the files they are for are being processed.
+    """
+    with _key_lock:
+        generate_key_from_password.cache_clear()
+        create_ciphers.cache_clear()
+
+
+def chunk_nonce(nonce_prefix, index, last):
+    """
+    Build the AES-GCM nonce for a single chunk of a file.
+
+    Args:
+        nonce_prefix (bytes): The random per-file nonce prefix
+        index (int): The position of the chunk in the file
+        last (bool): Whether this is the final chunk of the file
+
+    Returns:
+        bytes: A 12-byte nonce unique to this chunk
+    """
+    return nonce_prefix + index.to_bytes(4, "big") + (b"\x01" if last else b"\x00")
+
+
+def advise_sequential(file):
+    """
+    Hint to the kernel that a file will be read once from start to end.
+
+    Does nothing on platforms without posix_fadvise.
+
+    Args:
+        file (file): The file object that is about to be read
+    """
+    if hasattr(os, "posix_fadvise"):
+        with suppress(OSError):
+            os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+
+def drop_from_cache(file):
+    """
+    Hint to the kernel that a file's cached pages are no longer needed.
+
+    Files are read or written once, so keeping them in the page cache would
+    only evict more useful data. Does nothing on platforms without
+    posix_fadvise.
+
+    Args:
+        file (file): The file object that is done being read or written
+    """
+    if hasattr(os, "posix_fadvise"):
+        with suppress(OSError):
+            os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def preallocate(file, size):
+    """
+    Reserve disk space for a file that is about to be written.
+
+    Allocating the whole file up front lets the filesystem place it in as few
+    extents as possible instead of extending it on every write. Only files
+    larger than one chunk are preallocated, and nothing is done on platforms
+    without posix_fallocate. The caller must truncate the file after writing
+    in case it ends up shorter than expected.
+
+    Args:
+        file (file): The binary file object that is about to be written
+        size (int): The expected final size of the file in bytes
+    """
+    if size > CHUNK_SIZE and hasattr(os, "posix_fallocate"):
+        with suppress(OSError):
+            os.posix_fallocate(file.fileno(), 0, size)
+
+
+def thread_buffers(size, count):
+    """
+    Get chunk buffers that are reused across the files handled by a thread.
+
+    Allocating and zeroing megabyte-sized buffers for every file adds up on
+    directories of many small files, so each thread keeps one set of buffers
+    per size and count. A caller must be done with the buffers before asking
+    for the same size and count again on the same thread.
+
+    Args:
+        size (int): The size of each buffer in bytes
+        count (int): The number of buffers
 
     Returns:
-        bytes: A base64 URL-safe encoded key suitable for Fernet encryption
+        tuple: count bytearrays of size bytes each
+    """
+    pool = _thread_buffers.__dict__
+    buffers = pool.get((size, count))
+    if buffers is None:
+        buffers = pool[(size, count)] = tuple(bytearray(size) for _ in range(count))
+    return buffers
+
+
+def read_chunks(file, chunk_size):
     """
-    key = hashlib.sha256(password.encode()).digest()
-    return base64.urlsafe_b64encode(key)
+    Read the rest of a file in chunks, flagging the final chunk.
 
+    Chunks are read into two reused buffers alternately, so the next chunk can
+    be read ahead to tell whether the current one is the last without
+    allocating new bytes per chunk. The buffers come from thread_buffers, and
+    each chunk is only valid until the next one is requested.
 
-def encrypt_filename(filename, key):
+    Args:
+        file (file): A binary file object opened for reading
+        chunk_size (int): The size of every chunk but the last
+
+    Yields:
+        tuple: A (memoryview, bool) pair of the chunk and whether it is the
+            last one. An empty file yields a single empty final chunk.
+    """
+    buffers = thread_buffers(chunk_size, 2)
+    index = 0
+    chunk_length = file.readinto(buffers[0])
+    while True:
+        next_length = file.readinto(buffers[(index + 1) % 2])
+        yield memoryview(buffers[index % 2])[:chunk_length], next_length == 0
+        if next_length == 0:
+            return
+        chunk_length = next_length
+        index += 1
+
+
+@contextmanager
+def atomic_write(path):
     """
-    Encrypt a filename using Fernet encryption with filesystem-safe encoding.
+    Open a temporary file that is moved to path once fully written.
 
-    Encrypts the given filename using the provided key and converts it to a
-    filesystem-safe format by base64 encoding and replacing padding characters
-    with underscores to avoid potential filesystem issues.
+    The temporary file is created next to path, flushed to disk and then hard
+    linked into place, so path is either missing or has the complete content.
+    Linking fails if path already exists, so an existing file is never
+    replaced. The temporary file is removed if writing fails. mkstemp creates
+    the file readable only by its owner, so its mode is reset to the one
+    open() would use under the current umask before it is moved.
+
+    Args:
+        path (str): The final path of the file being written
+
+    Yields:
+        file: A binary file object opened for writing
+
+    Raises:
+        FileExistsError: If path already exists
+    """
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", prefix=".kubli-", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            yield temp_file
+            if hasattr(os, "fchmod"):
+                os.fchmod(temp_file.fileno(), 0o666 & ~_UMASK)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+            drop_from_cache(temp_file)
+        try:
+            os.link(temp_path, path)
+        except FileExistsError:
+            raise FileExistsError(f"{path} already exists") from None
+        except OSError:
+            # Filesystems without hard links, such as FAT, claim the name with
+            # an exclusive create before the file is moved over it
+            with open(path, "xb"):
+                pass
+            os.replace(temp_path, path)
+        else:
+            os.remove(temp_path)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.remove(temp_path)
+        raise
+
+
+def print_lines(lines):
+    """
+    Print several status lines with a single write to the terminal.
+
+    Colors are reset at the end of every line, as they would be when printing
+    each line separately with colorama's autoreset.
+
+    Args:
+        lines (list): The lines to print, possibly containing color codes
+    """
+    if lines:
+        print(f"{Style.RESET_ALL}\n".join(lines))
+
+
+def encrypt_filename(filename, aessiv):
+    """
+    Encrypt a filename using AES-SIV encryption with filesystem-safe encoding.
+
+    Encrypts the given filename using the provided AES-SIV instance and encodes
+    the ciphertext as URL-safe base64, with its trailing padding characters
+    stripped to keep the name filesystem-safe and short. The same filename
+    always encrypts to the same name under the same key.
 
     Args:
         filename (str): The original filename to encrypt
-        key (bytes): The Fernet encryption key
+        aessiv (AESSIV): The AES-SIV instance used for encryption
 
     Returns:
         str: The encrypted and filesystem-safe encoded filename, or None if encryption fails
@@ -42,28 +346,39 @@ def encrypt_filename(filename, key):
         Exception: Prints error message and returns None if encryption fails
     """
     try:
-        fernet = Fernet(key)
-        encrypted_filename = fernet.encrypt(filename.encode())
-        # Convert to base64 and remove padding characters that might cause filesystem issues
-        safe_filename = (
-            base64.urlsafe_b64encode(encrypted_filename).decode().replace("=", "_")
+        encrypted_filename = base64.urlsafe_b64encode(
+            aessiv.encrypt(filename.encode(), None)
         )
-        return safe_filename
+        # Remove padding characters that might cause filesystem issues
+        return encrypted_filename.rstrip(b"=").decode("ascii")
     except Exception as e:
         print(f"{Fore.RED}Error encrypting filename {filename}: {e}")
         return None
 
 
-def encrypt_file(file_path, key):
+def encrypt_file(file_path, password, salt=None, hide_name=True, delete_original=False):
     """
     Encrypt a single file with filename encryption.
 
-    Encrypts both the file content and filename using Fernet encryption.
+    Encrypts the file content with AES-GCM and the filename with AES-SIV.
     Creates a new encrypted file with .kubli extension and encrypted filename.
+    The file starts with FILE_HEADER, a flags byte, the scrypt salt and a
+    random nonce prefix, followed by the content streamed in CHUNK_SIZE
+    chunks, each with its own authentication tag, so memory use stays bounded
+    for large files. The output is written atomically, so a failure never
+    leaves a partial .kubli file behind, and an existing .kubli file is never
+    replaced. Files encrypted in one run share a
+    salt, so the key is derived once and shared across files.
 
     Args:
         file_path (str): Path to the file to encrypt
-        key (bytes): The Fernet encryption key
+        password (str): The password the file is encrypted with
+        salt (bytes, optional): The salt of the encryption run. A new random
+            salt is generated if not given.
+        hide_name (bool, optional): Whether to encrypt the filename. If False,
+            the original filename is kept and .kubli is appended to it.
+        delete_original (bool, optional): Whether to delete the original file
+            once the encrypted file is safely written
 
     Returns:
         bool: True if encryption successful, False if failed
@@ -72,34 +387,273 @@ def encrypt_file(file_path, key):
         Exception: Prints error message and returns False if encryption fails
     """
     try:
-        fernet = Fernet(key)
+        if salt is None:
+            salt = os.urandom(SALT_SIZE)
+        aessiv, aesgcm = load_ciphers(password, salt)
+
+        # Encrypt filename
+        directory, original_filename = os.path.split(file_path)
+        if hide_name:
+            encrypted_filename = encrypt_filename(original_filename, aessiv)
+            flags = 0
+        else:
+            encrypted_filename = original_filename
+            flags = FLAG_PLAIN_NAME
+
+        if encrypted_filename is None:
+            return False
 
-        # Read and encrypt file content
         with open(file_path, "rb") as file:
-            original_data = file.read()
+            advise_sequential(file)
+
+            # Create new encrypted file path
+            encrypted_file_path = os.path.join(directory, encrypted_filename + ".kubli")
+
+            with atomic_write(encrypted_file_path) as encrypted_file:
+                # Every chunk gains a tag, and even an empty file has one chunk
+                size = os.fstat(file.fileno()).st_size
+                chunk_count = max(1, -(-size // CHUNK_SIZE))
+                preallocate(encrypted_file, HEADER_SIZE + size + chunk_count * TAG_SIZE)
+
+                # The header, flags and salt are authenticated with every chunk
+                associated_data = FILE_HEADER + bytes([flags]) + salt
+                nonce_prefix = os.urandom(NONCE_PREFIX_SIZE)
+                encrypted_file.write(associated_data + nonce_prefix)
+
+                # The output buffer is reused for every chunk and every file
+                # instead of allocating new bytes
+                out_buffer = memoryview(thread_buffers(CHUNK_SIZE + TAG_SIZE, 1)[0])
+                for index, (chunk, last) in enumerate(read_chunks(file, CHUNK_SIZE)):
+                    nonce = chunk_nonce(nonce_prefix, index, last)
+                    written = aesgcm.encrypt_into(
+                        nonce,
+                        chunk,
+                        associated_data,
+                        out_buffer[: len(chunk) + TAG_SIZE],
+                    )
+                    encrypted_file.write(out_buffer[:written])
+                encrypted_file.truncate()
+
+            drop_from_cache(file)
+
+        if delete_original:
+            delete_files([file_path], quiet=True)
+
+        return True
+    except Exception as e:
+        print(f"{Fore.RED}Error encrypting {file_path}: {e}")
+        return False
 
-        encrypted_data = fernet.encrypt(original_data)
 
-        # Encrypt filename
-        original_filename = os.path.basename(file_path)
-        encrypted_filename = encrypt_filename(original_filename, key)
+class ChunkedEncryptor:
+    """
+    Writable file-like object that encrypts everything written to it.
+
+    Produces the same format as encrypt_file, so the output decrypts with
+    decrypt_file. Written data is buffered into CHUNK_SIZE chunks, and one
+    chunk is always held back until close so the final chunk can be flagged.
+
+    Args:
+        file (file): The binary file object the encrypted stream is written to
+        aesgcm (AESGCM): The AES-GCM instance used for the content
+        salt (bytes): The salt the content key was derived with
+        flags (int, optional): The header flags, such as FLAG_PLAIN_NAME
+    """
+
+    def __init__(self, file, aesgcm, salt, flags=0):
+        self.file = file
+        self.aesgcm = aesgcm
+        self.associated_data = FILE_HEADER + bytes([flags]) + salt
+        self.nonce_prefix = os.urandom(NONCE_PREFIX_SIZE)
+        self.index = 0
+        self.pending = bytearray()
+        file.write(self.associated_data + self.nonce_prefix)
+
+    def _write_chunk(self, chunk, last):
+        nonce = chunk_nonce(self.nonce_prefix, self.index, last)
+        self.file.write(self.aesgcm.encrypt(nonce, chunk, self.associated_data))
+        self.index += 1
+
+    def write(self, data):
+        self.pending += data
+        while len(self.pending) > CHUNK_SIZE:
+            self._write_chunk(bytes(self.pending[:CHUNK_SIZE]), last=False)
+            del self.pending[:CHUNK_SIZE]
+        return len(data)
+
+    def close(self):
+        """Encrypt the remaining data as the final chunk."""
+        self._write_chunk(bytes(self.pending), last=True)
+        self.pending.clear()
+
+
+def pack_files(file_paths, directory, password, hide_name=True):
+    """
+    Pack several files into a single encrypted archive.
+
+    The files are streamed into a tar archive named after PACK_FILENAME that
+    is encrypted on the fly into one .kubli file, so directories of many small
+    files pay the per-file encryption and file creation costs only once.
+    Decrypting the .kubli file gives back the tar archive.
+
+    Args:
+        file_paths (list): Paths of the files to pack
+        directory (str): The directory the encrypted archive is written to
+        password (str): The password the archive is encrypted with
+        hide_name (bool, optional): Whether to encrypt the archive filename
+
+    Returns:
+        bool: True if packing successful, False if failed
+
+    Raises:
+        Exception: Prints error message and returns False if packing fails
+    """
+    try:
+        salt = os.urandom(SALT_SIZE)
+        aessiv, aesgcm = load_ciphers(password, salt)
+        archive_filename = PACK_FILENAME.format(
+            timestamp=time.strftime("%Y%m%d-%H%M%S"), suffix=os.urandom(4).hex()
+        )
+        if hide_name:
+            encrypted_filename = encrypt_filename(archive_filename, aessiv)
+            flags = 0
+        else:
+            encrypted_filename = archive_filename
+            flags = FLAG_PLAIN_NAME
 
         if encrypted_filename is None:
             return False
 
-        # Create new encrypted file path
-        directory = os.path.dirname(file_path)
+        # Never replace a previous archive
         encrypted_file_path = os.path.join(directory, encrypted_filename + ".kubli")
-
-        with open(encrypted_file_path, "wb") as encrypted_file:
-            encrypted_file.write(encrypted_data)
+        with atomic_write(encrypted_file_path) as encrypted_file:
+            encryptor = ChunkedEncryptor(encrypted_file, aesgcm, salt, flags)
+            with tarfile.open(fileobj=encryptor, mode="w|") as archive:
+                for file_path in file_paths:
+                    archive.add(file_path, arcname=os.path.basename(file_path))
+            encryptor.close()
 
         return True
     except Exception as e:
-        print(f"{Fore.RED}Error encrypting {file_path}: {e}")
+        print(f"{Fore.RED}Error packing files: {e}")
         return False
 
 
+def list_files_to_encrypt(directory):
+    """
+    List the files in a directory that are eligible for encryption.
+
+    Args:
+        directory (str): The directory to scan
+
+    Returns:
+        list: The paths of the eligible files, largest first
+    """
+    # List all files in directory (excluding hidden, Python and already
+    # encrypted files). The name checks run first since they are cheapest, and
+    # scandir entries usually cache their type, so only the files that are
+    # kept need a stat() call for their size.
+    sized_files = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or entry.name.endswith(EXCLUDED_SUFFIXES):
+                    continue
+                # Skip files removed or made unreadable since the listing
+                with suppress(OSError):
+                    if entry.is_file(follow_symlinks=False):
+                        size = entry.stat(follow_symlinks=False).st_size
+                        sized_files.append((size, entry.path))
+    except OSError as e:
+        print(f"{Fore.RED}Error reading directory {directory}: {e}")
+        return []
+
+    # Process the largest files first so a big file does not start last and
+    # keep one worker busy after the others have finished
+    return [path for _, path in sorted(sized_files, reverse=True)]
+
+
+def encrypt_files(
+    file_paths,
+    password,
+    max_workers=MAX_WORKERS,
+    quiet=False,
+    hide_names=True,
+    delete_originals=False,
+):
+    """
+    Encrypt several files concurrently and report the result for each file.
+
+    All files share one new random salt, so the key is derived only once.
+
+    Args:
+        file_paths (list): Paths of the files to encrypt
+        password (str): The password the files are encrypted with
+        max_workers (int, optional): Number of files encrypted at the same time
+        quiet (bool, optional): Whether to skip printing the per-file results
+        hide_names (bool, optional): Whether to encrypt the filenames
+        delete_originals (bool, optional): Whether to delete each original file
+            as soon as it is encrypted
+
+    Returns:
+        list: The paths of the files that were encrypted successfully
+    """
+    salt = os.urandom(SALT_SIZE)
+
+    # Encrypt files concurrently (the crypto runs in C and releases the GIL)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(
+            executor.map(
+                encrypt_file,
+                file_paths,
+                repeat(password),
+                repeat(salt),
+                repeat(hide_names),
+                repeat(delete_originals),
+            )
+        )
+
+    # Collect the per-file status lines and print them at once, so large
+    # directories do not pay for one terminal write per line
+    successful_encryptions = []
+    status_lines = []
+    for file_path, success in zip(file_paths, results):
+        status_lines.append(f"Encrypting: {Fore.WHITE}{os.path.basename(file_path)}")
+        if success:
+            successful_encryptions.append(file_path)
+            status_lines.append(f"  {Fore.GREEN}✓ Encrypted successfully")
+        else:
+            status_lines.append(f"  {Fore.RED}✗ Failed to encrypt")
+    if not quiet:
+        print_lines(status_lines)
+
+    return successful_encryptions
+
+
+def delete_files(file_paths, quiet=False):
+    """
+    Delete files, reporting each deletion and any error.
+
+    Args:
+        file_paths (list): Paths of the files to delete
+        quiet (bool, optional): Whether to print only the errors
+
+    Returns:
+        None
+    """
+    delete_lines = []
+    for file_path in file_paths:
+        try:
+            os.remove(file_path)
+            if not quiet:
+                delete_lines.append(
+                    f"{Fore.GREEN}Deleted: {os.path.basename(file_path)}"
+                )
+        except Exception as e:
+            delete_lines.append(f"{Fore.RED}Error deleting {file_path}: {e}")
+    print_lines(delete_lines)
+
+
 def encrypt_directory():
     """
     Interactive directory encryption function.
@@ -114,8 +668,9 @@ def encrypt_directory():
         2. Gets target directory (defaults to current directory)
         3. Scans for eligible files to encrypt
         4. Shows list of files and asks for confirmation
-        5. Encrypts each file using Fernet encryption
-        6. Optionally deletes original files after successful encryption
+        5. Asks whether to delete the original files after encryption
+        6. Encrypts the files concurrently using AES-GCM encryption, deleting
+           each original as soon as it is encrypted if requested
         7. Reports encryption results
 
     Returns:
@@ -123,8 +678,9 @@ def encrypt_directory():
 
     File Filtering:
         - Excludes files with .kubli extension (already encrypted)
-        - Excludes the script file itself
-        - Only processes regular files (not directories)
+        - Excludes Python files, including the script file itself
+        - Excludes hidden files, such as leftover temporary files
+        - Only processes regular files (not directories or symlinks)
     """
     print(f"{Fore.CYAN}{Style.BRIGHT}--- Data Encryption ---")
 
@@ -134,8 +690,6 @@ def encrypt_directory():
         print(f"{Fore.RED}Error: Encryption key cannot be empty!")
         return
 
-    key = generate_key_from_password(password)
-
     # Get current directory
     directory = input(
         f"{Fore.YELLOW}Enter directory path (or press Enter for current directory): "
@@ -143,59 +697,35 @@ def encrypt_directory():
     if not directory:
         directory = os.getcwd()
 
-    if not os.path.exists(directory):
+    if not os.path.isdir(directory):
         print(f"{Fore.RED}Error: Directory '{directory}' does not exist!")
         return
 
-    # List all files in directory (excluding this script and already encrypted files)
-    # Get the main script name from the calling module
-    script_name = "kubli.py"
-    files_to_encrypt = []
-
-    for file_path in glob.glob(os.path.join(directory, "*")):
-        if (
-            os.path.isfile(file_path)
-            and not file_path.endswith(".kubli")
-            and os.path.basename(file_path) != script_name
-            and not os.path.basename(file_path).endswith(".py")  # Exclude Python files
-        ):
-            files_to_encrypt.append(file_path)
+    files_to_encrypt = list_files_to_encrypt(directory)
 
     if not files_to_encrypt:
         print(f"{Fore.YELLOW}No files found to encrypt!")
         return
 
     print(f"\n{Fore.BLUE}Files to encrypt ({len(files_to_encrypt)}):")
-    for file_path in files_to_encrypt:
-        print(f"  - {Fore.WHITE}{os.path.basename(file_path)}")
+    print_lines(
+        [f"  - {Fore.WHITE}{os.path.basename(file_path)}" for file_path in files_to_encrypt]
+    )
 
     confirm = input(f"\n{Fore.YELLOW}Proceed with encryption? (y/N): ").lower()
     if confirm != "y":
         print(f"{Fore.YELLOW}Encryption cancelled.")
         return
 
-    # Encrypt files
-    successful_encryptions = []
-    for file_path in files_to_encrypt:
-        print(f"Encrypting: {Fore.WHITE}{os.path.basename(file_path)}")
-        if encrypt_file(file_path, key):
-            successful_encryptions.append(file_path)
-            print(f"  {Fore.GREEN}✓ Encrypted successfully")
-        else:
-            print(f"  {Fore.RED}✗ Failed to encrypt")
-
-    # Delete original files if encryption was successful
-    if successful_encryptions:
-        delete_confirm = input(
-            f"\n{Fore.YELLOW}Delete {len(successful_encryptions)} original files? (y/N): "
-        ).lower()
-        if delete_confirm == "y":
-            for file_path in successful_encryptions:
-                try:
-                    os.remove(file_path)
-                    print(f"{Fore.GREEN}Deleted: {os.path.basename(file_path)}")
-                except Exception as e:
-                    print(f"{Fore.RED}Error deleting {file_path}: {e}")
+    # Ask before encrypting, so each original can be deleted as soon as its
+    # encrypted file is written instead of in a second pass
+    delete_confirm = input(
+        f"{Fore.YELLOW}Delete original files after encryption? (y/N): "
+    ).lower()
+
+    successful_encryptions = encrypt_files(
+        files_to_encrypt, password, delete_originals=delete_confirm == "y"
+    )
 
     print(
         f"\n{Fore.GREEN}{Style.BRIGHT}Encryption complete! {len(successful_encryptions)} files encrypted."